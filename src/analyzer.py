@@ -0,0 +1,426 @@
+"""
+static ROM analysis
+
+follow every path from the entry point through the decode table of a
+machine class, without running anything, to find the reachable
+instructions, split them into basic blocks joined by 1NNN / 2NNN /
+00EE / skip edges, and mark the bytes that ANNN points DXYN, FX33,
+FX55 and FX65 at as data:
+
+    python -m src.analyzer 2-ibm-logo.ch8
+
+analyze() caches its result by ROM hash and machine class, the same
+Analysis object is returned for the same ROM, treat it as read only
+
+BlockEngine.warm(analysis.blocks) compiles every block before the first
+instruction runs, analysis.overlaps lists the bytes that are both code
+and data, often self-modifying code
+"""
+import argparse
+import functools
+import hashlib
+import re
+import sys
+
+from .chip8 import PATTERNS, Chip8, read_rom
+from .extended import PATTERNS as EXTENDED_PATTERNS
+from .quirks import PROFILES
+
+SKIPS = {
+    'skip_equal',
+    'skip_not_equal',
+    'skip_equal_reg',
+    'skip_reg_not_equal',
+    'skip_key_pressed',
+    'skip_key_not_pressed',
+}
+
+# handlers that leave I at a value the analysis can not follow
+INDEX_CHANGES = {
+    'add_index',
+    'load_hex_sprite',
+    'load_big_hex_sprite',
+    'store_regs',
+    'read_regs',
+}
+
+UNVISITED = object()  # index state of a block no path has reached yet
+
+
+class Block:
+    """
+    straight-line instructions from start up to end, entered only at
+    start and left only after the last one
+    """
+    __slots__ = ('start', 'end', 'successors')
+
+    def __init__(self, start, end, successors):
+        self.start = start
+        self.end = end
+        self.successors = successors
+
+
+class Analysis:
+    """
+    instructions maps address -> (opcode, handler, operands, size),
+    blocks maps start address -> Block, regions is a list of
+    (address, length, kind, from pc) with kind 'sprite', 'read' or
+    'write', indirect holds the pcs of BNNN jumps whose targets are
+    unknown and invalid the reachable addresses that do not decode
+    """
+    def __init__(self, digest, start, memory, instructions, blocks, calls,
+                 regions, indirect, invalid):
+        self.digest = digest
+        self.start = start
+        self.memory = memory
+        self.instructions = instructions
+        self.blocks = blocks
+        self.calls = calls
+        self.regions = regions
+        self.indirect = indirect
+        self.invalid = invalid
+
+    @property
+    def code(self):
+        """
+        the set of addresses holding reachable instruction bytes
+        """
+        return {address + i for address, (_, _, _, size)
+                in self.instructions.items() for i in range(size)}
+
+    @property
+    def data(self):
+        """
+        the set of addresses read, written or drawn as data
+        """
+        return {address + i for address, length, _, _ in self.regions
+                for i in range(length)}
+
+    @property
+    def overlaps(self):
+        """
+        sorted addresses that are both code and data
+        """
+        return sorted(self.code & self.data)
+
+    def listing(self, end=None):
+        """
+        return the annotated disassembly from start to end, by default
+        the last byte that is code or data
+        """
+        kinds = {}
+
+        for address, length, kind, _ in self.regions:
+            for i in range(length):
+                kinds.setdefault(address + i, kind)
+
+        if end is None:
+            end = max(self.code | set(kinds) | {self.start}) + 1
+
+        targets = set()
+
+        for block in self.blocks.values():
+            targets.update(block.successors)
+
+        lines = []
+        address = self.start
+
+        while address < end:
+            if address in self.calls:
+                lines.append(f'sub_{address:03x}:')
+            elif address in targets:
+                lines.append(f'L{address:03x}:')
+
+            instruction = self.instructions.get(address)
+
+            if instruction is None:
+                kind = kinds.get(address, '')
+                comment = f'  ; {kind}' if kind else ''
+                lines.append(f'{address:03x}  {self.memory[address]:02x}    '
+                             f'  db{comment}')
+                address += 1
+                continue
+
+            opcode, handler, operands, size = instruction
+            text = mnemonic(handler, operands)
+            raw = f'{opcode:04x}'
+
+            if size == 4:
+                long = self.memory[address + 2] << 8 | self.memory[address + 3]
+                text += f' 0x{long:04x}'
+                raw += f'{long:04x}'
+
+            notes = [f'{kind} at 0x{start:03x}'
+                     for start, _, kind, pc in self.regions if pc == address]
+
+            if address in self.indirect:
+                notes.append('indirect jump')
+
+            if kinds.keys() & range(address, address + size):
+                notes.append('also data')
+
+            comment = f'  ; {", ".join(notes)}' if notes else ''
+            lines.append(f'{address:03x}  {raw:8}  {text}{comment}')
+            address += size
+
+        return '\n'.join(lines)
+
+
+def mnemonic(handler, operands):
+    """
+    return handler name and operands formatted after its opcode pattern
+    """
+    name = handler.__name__
+    pattern = PATTERNS.get(name) or EXTENDED_PATTERNS.get(name, name)
+    fields = re.findall(r'X|Y|N+', pattern[1:])
+    formatted = []
+
+    for field, operand in zip(fields, operands):
+        if field in ('X', 'Y'):
+            formatted.append(f'v{operand:X}')
+        elif len(field) == 1:
+            formatted.append(f'{operand}')
+        else:
+            formatted.append(f'0x{operand:0{len(field)}x}')
+
+    return ' '.join([name, ', '.join(formatted)]).strip()
+
+
+def successors(c8, pc, handler, operands):
+    """
+    return (next pcs, size), the addresses execution can continue at
+    after the instruction at pc and its size in bytes
+    """
+    memory = c8.memory
+    name = handler.__name__
+
+    if name == 'load_long_index':
+        return (pc + 4,), 4
+
+    if name in ('goto', 'call'):
+        follow = (pc + 2,) if name == 'call' else ()
+        return (operands[0],) + follow, 2
+
+    if name in ('ret', 'exit_interpreter', 'jump'):
+        return (), 2
+
+    if name in SKIPS:
+        skip = 4
+
+        if (hasattr(c8, 'load_long_index') and pc + 3 < len(memory)
+                and memory[pc + 2] == 0xF0 and memory[pc + 3] == 0x00):
+            skip = 6
+
+        return (pc + 2, pc + skip), 2
+
+    return (pc + 2,), 2
+
+
+def analyze_machine(c8, start=None):
+    """
+    analyze the program in the memory of c8 from start, pc by default,
+    the result is not cached
+    """
+    memory = c8.memory
+    table = c8._decode_table
+    start = c8.pc if start is None else start
+    instructions = {}
+    edges = {}
+    calls = set()
+    indirect = set()
+    invalid = set()
+    pending = [start]
+
+    while pending:
+        pc = pending.pop()
+
+        if pc in instructions or pc in invalid:
+            continue
+
+        if pc + 1 >= len(memory):
+            invalid.add(pc)
+            continue
+
+        opcode = memory[pc] << 8 | memory[pc + 1]
+        entry = table[opcode]
+
+        if entry is None:
+            invalid.add(pc)
+            continue
+
+        handler, operands = entry
+        following, size = successors(c8, pc, handler, operands)
+        instructions[pc] = (opcode, handler, operands, size)
+        edges[pc] = following
+        pending.extend(following)
+
+        if handler.__name__ == 'call':
+            calls.add(operands[0])
+        elif handler.__name__ == 'jump':
+            indirect.add(pc)
+
+    blocks = build_blocks(start, instructions, edges)
+    regions = find_regions(c8, start, instructions, blocks)
+    return Analysis(None, start, bytes(memory), instructions, blocks, calls,
+                    regions, indirect, invalid)
+
+
+def build_blocks(start, instructions, edges):
+    leaders = {start}
+
+    for pc, following in edges.items():
+        size = instructions[pc][3]
+
+        if following != (pc + size,):
+            leaders.update(following)
+            leaders.add(pc + size)
+
+    blocks = {}
+
+    for leader in sorted(leaders):
+        if leader not in instructions:
+            continue
+
+        pc = leader
+
+        while True:
+            size = instructions[pc][3]
+            following = edges[pc]
+
+            if (following != (pc + size,) or pc + size in leaders
+                    or pc + size not in instructions):
+                break
+
+            pc += size
+
+        blocks[leader] = Block(leader, pc + size, following)
+
+    return blocks
+
+
+def find_regions(c8, start, instructions, blocks):
+    """
+    follow the value of I through the blocks and return the memory
+    regions the instructions read, write or draw
+    """
+    memory = c8.memory
+    extended = hasattr(c8, 'high_resolution')
+    entry = dict.fromkeys(blocks, UNVISITED)
+    entry[start] = None  # I is unknown on entry
+    regions = set()
+    pending = [start] if start in blocks else []
+
+    while pending:
+        start = pending.pop()
+        index = entry[start]
+
+        if index is UNVISITED:
+            continue
+
+        block = blocks[start]
+        pc = start
+
+        while pc < block.end:
+            opcode, handler, operands, size = instructions[pc]
+            name = handler.__name__
+
+            if index is not None:
+                region = data_region(name, operands, extended)
+
+                if region is not None:
+                    length, kind = region
+
+                    if length:
+                        regions.add((index, length, kind, pc))
+
+            if name == 'load_index':
+                index = operands[0]
+            elif name == 'load_long_index':
+                index = memory[pc + 2] << 8 | memory[pc + 3]
+            elif name in INDEX_CHANGES:
+                index = None
+
+            pc += size
+
+        call = instructions[pc - size][1].__name__ == 'call'
+
+        for i, target in enumerate(block.successors):
+            if target not in entry:
+                continue
+
+            # the subroutine may change I before coming back
+            state = None if call and i == 1 else index
+
+            if entry[target] is UNVISITED:
+                entry[target] = state
+            elif entry[target] is not None and entry[target] != state:
+                entry[target] = None
+            else:
+                continue
+
+            pending.append(target)
+
+    return sorted(regions)
+
+
+def data_region(name, operands, extended):
+    """
+    return (length, kind) of the memory at I the instruction uses
+    """
+    match name:
+        case 'draw':
+            n = operands[2]
+            return (32 if extended else 0) if n == 0 else n, 'sprite'
+        case 'read_regs':
+            return operands[0] + 1, 'read'
+        case 'store_regs':
+            return operands[0] + 1, 'write'
+        case 'store_bcd':
+            return 3, 'write'
+        case 'read_range':
+            return abs(operands[1] - operands[0]) + 1, 'read'
+        case 'store_range':
+            return abs(operands[1] - operands[0]) + 1, 'write'
+        case 'load_pattern':
+            return 16, 'read'
+
+    return None
+
+
+def analyze(source, cls=Chip8, member=None):
+    """
+    analyze a rom, given as read_rom accepts it, for machine class cls
+    """
+    return _analyze(read_rom(source, member), cls)
+
+
+@functools.lru_cache(maxsize=256)
+def _analyze(image, cls):
+    c8 = cls()
+    c8.load_rom(image)
+    analysis = analyze_machine(c8)
+    analysis.digest = hashlib.sha256(image).digest()
+    return analysis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='disassemble ROMs')
+    parser.add_argument('roms', nargs='+', help='.ch8 files')
+    parser.add_argument('--profile', choices=PROFILES, default='chip8',
+                        help='quirk profile')
+    args = parser.parse_args(argv)
+
+    for rom in args.roms:
+        analysis = analyze(rom, PROFILES[args.profile])
+        print(f'; {rom}')
+        print(analysis.listing())
+        print(f'; {len(analysis.instructions)} instructions in '
+              f'{len(analysis.blocks)} blocks, {len(analysis.data)} data '
+              f'bytes, {len(analysis.overlaps)} overlapping, '
+              f'{len(analysis.indirect)} indirect jumps')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+import random
+from array import array
+
+import numpy as np
+
+from .chip8 import Chip8, RomError, read_rom
+
+
+class Chip8Batch:
+    """
+    many Chip8 machines executed in lockstep on numpy arrays
+
+    lane i holds the state of one machine, step() executes one
+    instruction on every running lane, grouping lanes by opcode family
+    so each family costs a few array operations however many lanes run it
+
+    a lane that hits an invalid opcode or an out of range address is
+    marked in faulted and stops, where Chip8 would raise
+
+    lane i draws CXNN values like Chip8(seed=seeds[i])
+    """
+    def __init__(self, lanes, seeds=None):
+        self.lanes = lanes
+        self.opcode = np.zeros(lanes, np.int64)
+        self.memory = np.zeros((lanes, 4096), np.uint8)
+        self.gfx = np.zeros((lanes, 32), np.uint64)  # rows as in FrameBuffer
+        self.regs = np.zeros((lanes, 16), np.uint8)
+        self.index = np.zeros(lanes, np.int64)
+        self.pc = np.full(lanes, 0x200, np.int64)
+        self.delay_timer = np.zeros(lanes, np.int64)
+        self.sound_timer = np.zeros(lanes, np.int64)
+        self.draw_flag = np.zeros(lanes, np.bool_)
+        self.stack = np.zeros((lanes, 16), np.int64)
+        self.sp = np.zeros(lanes, np.int64)
+        self.keys = np.zeros((lanes, 16), np.uint8)
+        self.cycles = np.zeros(lanes, np.int64)
+        self.faulted = np.zeros(lanes, np.bool_)
+
+        if seeds is None:
+            seeds = range(lanes)
+
+        self.rngs = [random.Random(seed) for seed in seeds]
+
+        self.families = [
+            self.family_0, self.goto, self.call, self.skip_equal,
+            self.skip_not_equal, self.skip_equal_reg, self.load_reg,
+            self.add_constant, self.family_8, self.skip_reg_not_equal,
+            self.load_index, self.jump, self.random_value, self.draw,
+            self.family_e, self.family_f,
+        ]
+
+    @classmethod
+    def from_machines(cls, machines):
+        """
+        build a batch with one lane per Chip8 instance,
+        lanes implement the plain Chip8 instruction set only
+        """
+        batch = cls(len(machines))
+
+        for lane, c8 in enumerate(machines):
+            if type(c8) is not Chip8:
+                raise ValueError(f'{type(c8).__name__} can not run in a batch')
+
+            batch.rngs[lane].setstate(c8.rng.getstate())
+            batch.memory[lane] = np.frombuffer(bytes(c8.memory), np.uint8)
+            batch.gfx[lane] = c8.gfx.rows
+            batch.regs[lane] = np.frombuffer(bytes(c8.regs), np.uint8)
+            batch.stack[lane] = list(c8.stack)
+            batch.keys[lane] = np.frombuffer(bytes(c8.keys), np.uint8)
+            batch.opcode[lane] = c8.opcode
+            batch.index[lane] = c8.index
+            batch.pc[lane] = c8.pc
+            batch.delay_timer[lane] = c8.delay_timer
+            batch.sound_timer[lane] = c8.sound_timer
+            batch.draw_flag[lane] = c8.draw_flag
+            batch.sp[lane] = c8.sp
+            batch.cycles[lane] = c8.cycles
+
+        return batch
+
+    def machine(self, lane):
+        """
+        return a Chip8 instance holding the state of lane
+        """
+        c8 = Chip8()
+        c8.rng.setstate(self.rngs[lane].getstate())
+        c8.memory[:] = self.memory[lane].tobytes()
+        c8.gfx.rows = [int(row) for row in self.gfx[lane]]
+        c8.regs[:] = self.regs[lane].tobytes()
+        c8.stack = array('H', [int(v) for v in self.stack[lane]])
+        c8.keys[:] = self.keys[lane].tobytes()
+        c8.opcode = int(self.opcode[lane])
+        c8.index = int(self.index[lane])
+        c8.pc = int(self.pc[lane])
+        c8.delay_timer = int(self.delay_timer[lane])
+        c8.sound_timer = int(self.sound_timer[lane])
+        c8.draw_flag = bool(self.draw_flag[lane])
+        c8.sp = int(self.sp[lane])
+        c8.cycles = int(self.cycles[lane])
+        return c8
+
+    def load_rom(self, source, member=None):
+        data = read_rom(source, member)
+
+        if not data or 0x200 + len(data) > 4096:
+            raise RomError(f'rom of {len(data)} bytes does not fit')
+
+        self.memory[:, 0x200:0x200 + len(data)] = np.frombuffer(data,
+                                                                np.uint8)
+
+    def press_key(self, lane, key):
+        self.keys[lane, key] = 1
+
+    def release_key(self, lane, key):
+        self.keys[lane, key] = 0
+
+    def run(self, cycles):
+        for _ in range(cycles):
+            self.step()
+
+    def step(self):
+        """
+        execute one instruction on every lane that has not faulted
+        """
+        lanes = np.flatnonzero(~self.faulted)
+        pc = self.pc[lanes]
+        fetchable = pc + 1 < 4096
+        self.fault(lanes[~fetchable])
+        lanes = lanes[fetchable]
+        pc = pc[fetchable]
+
+        memory = self.memory
+        opcode = memory[lanes, pc].astype(np.int64) << 8
+        opcode |= memory[lanes, pc + 1]
+        self.opcode[lanes] = opcode
+        self.pc[lanes] = pc + 2
+        self.draw_flag[lanes] = False
+        family = opcode >> 12
+        executed = np.zeros(self.lanes, np.bool_)
+        executed[lanes] = True
+
+        for value in np.unique(family):
+            selected = family == value
+            self.families[value](lanes[selected], opcode[selected])
+
+        executed &= ~self.faulted
+        done = np.flatnonzero(executed)
+        self.cycles[done] += 1
+        timer = self.delay_timer[done]
+        self.delay_timer[done] = np.where(timer > 0, timer - 1, 0)
+        timer = self.sound_timer[done]
+        self.sound_timer[done] = np.where(timer > 0, timer - 1, 0)
+
+    def fault(self, lanes):
+        self.faulted[lanes] = True
+
+    def skip(self, lanes, condition):
+        self.pc[lanes[condition]] += 2
+
+    def reg(self, lanes, i):
+        return self.regs[lanes, i].astype(np.int64)
+
+    # 00E0 00EE
+    def family_0(self, lanes, opcode):
+        nn = opcode & 0xFF
+        clear = lanes[nn == 0xE0]
+        self.gfx[clear] = 0
+
+        ret = nn == 0xEE
+        lanes_ret = lanes[ret]
+        sp = self.sp[lanes_ret] - 1
+        valid = sp >= -16
+        self.fault(lanes_ret[~valid])
+        lanes_ret = lanes_ret[valid]
+        sp = sp[valid]
+        self.sp[lanes_ret] = sp
+        self.pc[lanes_ret] = self.stack[lanes_ret, sp]
+
+        self.fault(lanes[(nn != 0xE0) & ~ret])
+
+    # 1NNN
+    def goto(self, lanes, opcode):
+        self.pc[lanes] = opcode & 0xFFF
+
+    # 2NNN
+    def call(self, lanes, opcode):
+        sp = self.sp[lanes]
+        valid = (sp < 16) & (sp >= -16)
+        self.fault(lanes[~valid])
+        lanes = lanes[valid]
+        sp = sp[valid]
+        self.stack[lanes, sp] = self.pc[lanes]
+        self.sp[lanes] = sp + 1
+        self.pc[lanes] = opcode[valid] & 0xFFF
+
+    # 3XNN
+    def skip_equal(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        self.skip(lanes, self.reg(lanes, x) == (opcode & 0xFF))
+
+    # 4XNN
+    def skip_not_equal(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        self.skip(lanes, self.reg(lanes, x) != (opcode & 0xFF))
+
+    # 5XYN
+    def skip_equal_reg(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        y = (opcode >> 4) & 0xF
+        self.skip(lanes, self.reg(lanes, x) == self.reg(lanes, y))
+
+    # 6XNN
+    def load_reg(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        self.regs[lanes, x] = opcode & 0xFF
+
+    # 7XNN
+    def add_constant(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        self.regs[lanes, x] = (self.reg(lanes, x) + (opcode & 0xFF)) & 0xFF
+
+    # 8XY0 - 8XYE
+    def family_8(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        y = (opcode >> 4) & 0xF
+        n = opcode & 0xF
+        regs = self.regs
+
+        self.fault(lanes[(n > 0x7) & (n != 0xE)])
+
+        for op in np.unique(n):
+            selected = n == op
+            lanes_op = lanes[selected]
+            x_op = x[selected]
+            y_op = y[selected]
+            vx = self.reg(lanes_op, x_op)
+            vy = self.reg(lanes_op, y_op)
+
+            match op:
+                case 0x0:
+                    regs[lanes_op, x_op] = vy
+                case 0x1:
+                    regs[lanes_op, x_op] = vx | vy
+                case 0x2:
+                    regs[lanes_op, x_op] = vx & vy
+                case 0x3:
+                    regs[lanes_op, x_op] = vx ^ vy
+                case 0x4:
+                    val = vx + vy
+                    regs[lanes_op, x_op] = val & 0xFF
+                    regs[lanes_op, 0xF] = val > 0xFF
+                case 0x5:
+                    regs[lanes_op, x_op] = (vx - vy) & 0xFF
+                    regs[lanes_op, 0xF] = vx >= regs[lanes_op, y_op]
+                case 0x6:
+                    regs[lanes_op, x_op] = vx >> 1
+                    regs[lanes_op, 0xF] = vx & 0x1
+                case 0x7:
+                    regs[lanes_op, x_op] = (vy - vx) & 0xFF
+                    regs[lanes_op, 0xF] = (regs[lanes_op, y_op]
+                                           > regs[lanes_op, x_op])
+                case 0xE:
+                    regs[lanes_op, x_op] = (vx << 1) & 0xFF
+                    regs[lanes_op, 0xF] = (vx & 0x80) >> 7
+
+    # 9XYN
+    def skip_reg_not_equal(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        y = (opcode >> 4) & 0xF
+        self.skip(lanes, self.reg(lanes, x) != self.reg(lanes, y))
+
+    # ANNN
+    def load_index(self, lanes, opcode):
+        self.index[lanes] = opcode & 0xFFF
+
+    # BNNN
+    def jump(self, lanes, opcode):
+        self.pc[lanes] = self.reg(lanes, 0) + (opcode & 0xFFF)
+
+    # CXNN
+    def random_value(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        values = [self.rngs[lane].randint(0, 255) for lane in lanes]
+        self.regs[lanes, x] = np.array(values, np.int64) & opcode & 0xFF
+
+    # DXYN
+    def draw(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        y = (opcode >> 4) & 0xF
+        n = opcode & 0xF
+        index = self.index[lanes]
+        valid = index + n <= 4096
+        self.fault(lanes[~valid])
+        lanes, x, y, n, index = (lanes[valid], x[valid], y[valid], n[valid],
+                                 index[valid])
+
+        x_pos = (self.reg(lanes, x) % 64).astype(np.uint64)
+        y_pos = self.reg(lanes, y) % 32
+        self.regs[lanes, 0xF] = 0
+        collision = np.zeros(len(lanes), np.bool_)
+        gfx = self.gfx
+        spill = x_pos > 56
+
+        for row in range(int(n.max(initial=0))):
+            active = n > row
+            lanes_row = lanes[active]
+            line = self.memory[lanes_row, index[active] + row]
+            line = line.astype(np.uint64)
+            shift = x_pos[active]
+            high = (line << np.uint64(56)) >> shift
+            low = np.where(spill[active],
+                           line << ((np.uint64(120) - shift) & np.uint64(63)),
+                           np.uint64(0))
+            y_row = (y_pos[active] + row) % 32
+            collision[active] |= (gfx[lanes_row, y_row] & high) != 0
+            gfx[lanes_row, y_row] ^= high
+            y_row = (y_row + 1) % 32
+            collision[active] |= (gfx[lanes_row, y_row] & low) != 0
+            gfx[lanes_row, y_row] ^= low
+
+        self.regs[lanes, 0xF] = collision
+        self.draw_flag[lanes] = True
+
+    # EX9E EXA1
+    def family_e(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        nn = opcode & 0xFF
+        valid = (nn == 0x9E) | (nn == 0xA1)
+        key = self.reg(lanes, x)
+        valid &= key < 16
+        self.fault(lanes[~valid])
+        lanes, nn, key = lanes[valid], nn[valid], key[valid]
+        pressed = self.keys[lanes, key] == 1
+        self.skip(lanes, np.where(nn == 0x9E, pressed,
+                                  self.keys[lanes, key] == 0))
+
+    # FX07 - FX65
+    def family_f(self, lanes, opcode):
+        x = (opcode >> 8) & 0xF
+        nn = opcode & 0xFF
+
+        for op in np.unique(nn):
+            selected = nn == op
+            lanes_op = lanes[selected]
+            x_op = x[selected]
+
+            match op:
+                case 0x07:
+                    delay_timer = self.delay_timer[lanes_op]
+                    self.regs[lanes_op, x_op] = delay_timer & 0xFF
+                case 0x0A:
+                    keys = self.keys[lanes_op] != 0
+                    pressed = keys.any(axis=1)
+                    lanes_key = lanes_op[pressed]
+                    self.regs[lanes_key, x_op[pressed]] = (
+                        keys[pressed].argmax(axis=1))
+                case 0x15:
+                    self.delay_timer[lanes_op] = self.reg(lanes_op, x_op)
+                case 0x18:
+                    self.sound_timer[lanes_op] = self.reg(lanes_op, x_op)
+                case 0x1E:
+                    self.index[lanes_op] += self.reg(lanes_op, x_op)
+                case 0x29:
+                    pass
+                case 0x33:
+                    self.store_bcd(lanes_op, x_op)
+                case 0x55:
+                    self.store_regs(lanes_op, x_op)
+                case 0x65:
+                    self.read_regs(lanes_op, x_op)
+                case _:
+                    self.fault(lanes_op)
+
+    def in_memory(self, lanes, x, length):
+        """
+        fault lanes whose access at I runs past memory, return the rest
+        """
+        valid = self.index[lanes] + length <= 4096
+        self.fault(lanes[~valid])
+        return lanes[valid], x[valid]
+
+    # FX33
+    def store_bcd(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, 3)
+        val = self.reg(lanes, x)
+        index = self.index[lanes]
+        self.memory[lanes, index] = val // 100 % 10
+        self.memory[lanes, index + 1] = val // 10 % 10
+        self.memory[lanes, index + 2] = val % 10
+
+    # FX55
+    def store_regs(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, x + 1)
+        index = self.index[lanes]
+
+        for i in range(16):
+            active = x >= i
+            self.memory[lanes[active], index[active] + i] = (
+                self.regs[lanes[active], i])
+
+    # FX65
+    def read_regs(self, lanes, x):
+        lanes, x = self.in_memory(lanes, x, x + 1)
+        index = self.index[lanes]
+
+        for i in range(16):
+            active = x >= i
+            self.regs[lanes[active], i] = (
+                self.memory[lanes[active], index[active] + i])
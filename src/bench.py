@@ -0,0 +1,180 @@
+"""
+emulator benchmarks
+
+run the bundled ROMs and synthetic opcode mixes through emulate_cycle
+and Chip8.run, report instructions per second, nanoseconds per opcode
+family and memory per instance, and compare against a stored baseline:
+
+    python -m src.bench --save bench_baseline.json
+    python -m src.bench --baseline bench_baseline.json --threshold 0.1
+
+the run fails when any benchmark is slower than its baseline by more
+than threshold
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from .chip8 import Chip8
+from .profiler import Profiler
+
+ROMS = [
+    '1-chip8-logo.ch8',
+    '2-ibm-logo.ch8',
+    '3-corax+.ch8',
+    '4-flags.ch8',
+    '5-quirks.ch8',
+    '6-keypad.ch8',
+]
+
+# synthetic programs loaded at 0x200, each loops forever
+MIXES = {
+    # A20A D01F 7008 1202, sprite data at 0x20A
+    'draw': bytes([0xA2, 0x0A, 0xD0, 0x1F, 0x70, 0x08, 0x12, 0x02,
+                   0x00, 0x00]) + bytes(range(0xF0, 0xFF)),
+    # 7001 8014 8125 8236 8303 8106 820E 1200
+    'alu': bytes([0x70, 0x01, 0x80, 0x14, 0x81, 0x25, 0x82, 0x36,
+                  0x83, 0x03, 0x81, 0x06, 0x82, 0x0E, 0x12, 0x00]),
+    # 2206 1200 0000 220A 00EE 00EE
+    'call': bytes([0x22, 0x06, 0x12, 0x00, 0x00, 0x00, 0x22, 0x0A,
+                   0x00, 0xEE, 0x00, 0xEE]),
+}
+
+
+def machine(source):
+    c8 = Chip8(seed=0)
+    c8.load_rom(source)
+    c8.memory[0x1FF] = 1  # 5-quirks.ch8 starts its CHIP-8 test
+    return c8
+
+
+def sources():
+    return [(rom, rom) for rom in ROMS] + list(MIXES.items())
+
+
+def measure(source, cycles, repeat, batch=False):
+    """
+    return the best instructions per second of repeat runs, through
+    emulate_cycle or with batch through one Chip8.run call, which does
+    not skip idle loops here so every instruction really runs
+    """
+    best = 0
+
+    for _ in range(repeat):
+        c8 = machine(source)
+        emulate_cycle = c8.emulate_cycle
+        start = time.perf_counter()
+
+        if batch:
+            c8.run(cycles, skip_idle=False)
+        else:
+            for _ in range(cycles):
+                emulate_cycle()
+
+        elapsed = time.perf_counter() - start
+        best = max(best, cycles / elapsed)
+
+    return best
+
+
+def opcode_costs(source, cycles):
+    profiler = Profiler(machine(source))
+    profiler.run(cycles)
+    return {
+        family: round(profiler.times[family] / count, 1)
+        for family, count in profiler.counts.items()
+    }
+
+
+def instance_memory(count=100):
+    """
+    return the bytes allocated per loaded machine
+    """
+    machine(ROMS[0])
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    machines = [machine(ROMS[0]) for _ in range(count)]
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in end.compare_to(start, 'filename'))
+    del machines
+    return size // count
+
+
+def run_benchmarks(cycles=20000, repeat=3):
+    results = {}
+
+    for name, source in sources():
+        results[name] = {
+            'ips': round(measure(source, cycles, repeat)),
+            'run_ips': round(measure(source, cycles, repeat, batch=True)),
+            'ns_per_op': opcode_costs(source, cycles),
+        }
+
+    return {'benchmarks': results, 'bytes_per_instance': instance_memory()}
+
+
+def regressions(report, baseline, threshold):
+    """
+    return (name, ips, baseline ips) for every benchmark that slowed
+    down by more than threshold, Chip8.run results are named 'name run'
+    """
+    slow = []
+
+    for name, result in baseline['benchmarks'].items():
+        current = report['benchmarks'].get(name)
+
+        if current is None:
+            continue
+
+        for key, label in (('ips', name), ('run_ips', f'{name} run')):
+            if key not in result or key not in current:
+                continue
+
+            if current[key] < result[key] * (1 - threshold):
+                slow.append((label, current[key], result[key]))
+
+    return slow
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark the emulator')
+    parser.add_argument('--cycles', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write the report as a baseline')
+    parser.add_argument('--baseline', help='baseline to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed slowdown, 0.1 is 10%%')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.cycles, args.repeat)
+
+    for name, result in report['benchmarks'].items():
+        print(f"{name:20} {result['ips']:>12,} instructions/s, "
+              f"{result['run_ips']:>12,} in Chip8.run")
+
+    print(f"{'memory':20} {report['bytes_per_instance']:>12,} bytes/instance")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+        slow = regressions(report, baseline, args.threshold)
+
+        for name, ips, expected in slow:
+            print(f'REGRESSION {name}: {ips:,} < {expected:,} instructions/s')
+
+        if slow:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,225 @@
+from .chip8 import Chip8
+
+BLOCK_LIMIT = 32  # instructions per compiled block
+
+# handlers that neither read nor write pc, timers or draw_flag,
+# every other handler ends the block it appears in
+STRAIGHT = {
+    'clear_screen',
+    'load_reg',
+    'add_constant',
+    'set_reg',
+    'bitwise_or',
+    'bitwise_and',
+    'bitwise_xor',
+    'add',
+    'sub',
+    'shr',
+    'subn',
+    'shl',
+    'load_index',
+    'random_value',
+    'add_index',
+    'load_hex_sprite',
+    'read_regs',
+}
+
+# handlers simple enough to be emitted inline
+INLINE = {
+    Chip8.load_reg: 'regs[{0}] = {1}',
+    Chip8.add_constant: 'regs[{0}] = (regs[{0}] + {1}) & 0xFF',
+    Chip8.set_reg: 'regs[{0}] = regs[{1}]',
+    Chip8.load_index: 'self.index = {0}',
+}
+
+
+class BlockEngine:
+    """
+    execution engine that compiles straight-line runs of instructions
+    into cached python functions
+
+    a block runs exactly like the same number of emulate_cycle calls,
+    blocks are dropped when FX33 / FX55 / load_rom write into them,
+    call invalidate() after writing chip8.memory directly
+    """
+    def __init__(self, chip8, limit=BLOCK_LIMIT):
+        self.chip8 = chip8
+        self.limit = limit
+        self.blocks = {}  # start pc -> (function, end pc, instruction count)
+        self.code_map = bytearray(len(chip8.memory))
+        chip8.write_listeners.append(self.on_write)
+
+    def detach(self):
+        self.chip8.write_listeners.remove(self.on_write)
+        self.invalidate()
+
+    def on_write(self, address, length):
+        if any(self.code_map[address:address + length]):
+            self.invalidate(address, length)
+
+    def invalidate(self, address=0, length=None):
+        """
+        drop every cached block overlapping [address, address + length)
+        """
+        if length is None:
+            length = len(self.code_map)
+
+        end = address + length
+        stale = [
+            start for start, block in self.blocks.items()
+            if block[1] > address and start < end
+        ]
+
+        # in place, run() holds on to the dict
+        for start in stale:
+            del self.blocks[start]
+
+        self.code_map = bytearray(len(self.code_map))
+
+        for start, block in self.blocks.items():
+            self.code_map[start:block[1]] = b'\x01' * (block[1] - start)
+
+    def step(self):
+        """
+        run the block at pc, return the number of instructions executed
+        """
+        c8 = self.chip8
+        block = self.blocks.get(c8.pc)
+
+        if block is None:
+            block = self.compile(c8.pc)
+
+            if block is None:
+                c8.emulate_cycle()
+                return 1
+
+        block[0](c8)
+        return block[2]
+
+    def run(self, cycles):
+        """
+        run exactly cycles instructions
+        """
+        c8 = self.chip8
+        blocks = self.blocks
+        done = 0
+
+        while done < cycles:
+            block = blocks.get(c8.pc)
+
+            if block is None:
+                block = self.compile(c8.pc)
+
+            if block is None or done + block[2] > cycles:
+                c8.emulate_cycle()
+                done += 1
+            else:
+                block[0](c8)
+                done += block[2]
+
+        return done
+
+    def compile(self, start):
+        """
+        translate the instructions at start into a function and cache it,
+        return None when the first instruction can not be translated
+        """
+        c8 = self.chip8
+        table = c8._decode_table
+        memory = c8.memory
+        instructions = []
+        pc = start
+
+        while pc + 1 < len(memory) and len(instructions) < self.limit:
+            opcode = memory[pc] << 8 | memory[pc + 1]
+            entry = table[opcode]
+
+            if entry is None:
+                break
+
+            instructions.append((opcode, entry[0], entry[1]))
+            pc += 2
+
+            if entry[0].__name__ not in STRAIGHT:
+                break
+
+        if not instructions:
+            return None
+
+        function = self.generate(start, instructions)
+        block = (function, pc, len(instructions))
+        self.blocks[start] = block
+        self.code_map[start:pc] = b'\x01' * (pc - start)
+        return block
+
+    def warm(self, addresses):
+        """
+        compile the blocks at addresses ahead of time, e.g. the blocks
+        of analyzer.analyze, return the number of new blocks
+        """
+        compiled = 0
+
+        for start in addresses:
+            if start not in self.blocks and self.compile(start) is not None:
+                compiled += 1
+
+        return compiled
+
+    @staticmethod
+    def generate(start, instructions):
+        """
+        emit the source of one block and compile it
+        """
+        count = len(instructions)
+        last = instructions[-1]
+        terminator = last[1].__name__ not in STRAIGHT
+        body = instructions[:-1] if terminator else instructions
+        namespace = {}
+        lines = [
+            'def block(self):',
+            '    regs = self.regs',
+            '    self.draw_flag = False',
+        ]
+
+        for i, (opcode, handler, operands) in enumerate(body):
+            template = INLINE.get(handler)
+
+            if template is not None:
+                lines.append('    ' + template.format(*operands))
+            else:
+                namespace[f'h{i}'] = handler
+                args = ''.join(f', {operand}' for operand in operands)
+                lines.append(f'    h{i}(self{args})')
+
+        lines.append(f'    self.cycles += {count}')
+        lines.append(f'    self.opcode = {last[0]}')
+        lines.append(f'    self.pc = {start + 2 * count}')
+
+        if terminator:
+            ticks = count - 1
+
+            if ticks:
+                lines.extend(BlockEngine.tick_lines(ticks))
+
+            namespace['term'] = last[1]
+            args = ''.join(f', {operand}' for operand in last[2])
+            lines.append(f'    term(self{args})')
+            lines.extend(BlockEngine.tick_lines(1))
+        else:
+            lines.extend(BlockEngine.tick_lines(count))
+
+        exec('\n'.join(lines), namespace)
+        return namespace['block']
+
+    @staticmethod
+    def tick_lines(ticks):
+        """
+        count timers down as ticks emulate_cycle calls would
+        """
+        count = f'timer - {ticks} if timer > {ticks} else 0'
+        return [
+            '    timer = self.delay_timer',
+            f'    self.delay_timer = {count}',
+            '    timer = self.sound_timer',
+            f'    self.sound_timer = {count}',
+        ]
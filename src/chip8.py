@@ -1,12 +1,118 @@
+import functools
+import hashlib
+import os
 import random
+import struct
+import zipfile
+import zlib
+from array import array
+
+# magic, memory size, width, height, opcode, index, pc, sp,
+# delay timer, sound timer, cycles, timer phase
+SNAPSHOT_HEADER = struct.Struct('<4sIHHHIIiBBQI')
+SNAPSHOT_MAGIC = b'C8S2'
+# Mersenne Twister state of rng, 624 words and the position in them
+SNAPSHOT_RNG = struct.Struct('<625I')
+
+# opcode pattern handled by each handler
+PATTERNS = {
+    'clear_screen': '00E0',
+    'ret': '00EE',
+    'goto': '1NNN',
+    'call': '2NNN',
+    'skip_equal': '3XNN',
+    'skip_not_equal': '4XNN',
+    'skip_equal_reg': '5XY0',
+    'load_reg': '6XNN',
+    'add_constant': '7XNN',
+    'set_reg': '8XY0',
+    'bitwise_or': '8XY1',
+    'bitwise_and': '8XY2',
+    'bitwise_xor': '8XY3',
+    'add': '8XY4',
+    'sub': '8XY5',
+    'shr': '8XY6',
+    'subn': '8XY7',
+    'shl': '8XYE',
+    'skip_reg_not_equal': '9XY0',
+    'load_index': 'ANNN',
+    'jump': 'BNNN',
+    'random_value': 'CXNN',
+    'draw': 'DXYN',
+    'skip_key_pressed': 'EX9E',
+    'skip_key_not_pressed': 'EXA1',
+    'load_delay': 'FX07',
+    'load_key_pressed': 'FX0A',
+    'set_delay': 'FX15',
+    'set_sound': 'FX18',
+    'add_index': 'FX1E',
+    'load_hex_sprite': 'FX29',
+    'store_bcd': 'FX33',
+    'store_regs': 'FX55',
+    'read_regs': 'FX65',
+}
+
+# first nibble of the instruction a loop that idle_loop may recognise
+# starts with, 1NNN, EX9E / EXA1 or FX07
+IDLE_HEADS = frozenset((0x1, 0xE, 0xF))
+
+
+def read_rom(source, member=None):
+    """
+    return the bytes of a rom given as a path, bytes or a file-like object,
+    a zip archive path needs member unless it holds a single .ch8 file
+
+    bytes are returned as they are, files are cached by path, mtime and
+    size, so reloading an unchanged file returns the same object
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+
+    if hasattr(source, 'read'):
+        return bytes(source.read())
+
+    path = os.path.realpath(source)
+    stat = os.stat(path)
+    return _read_rom_file(path, stat.st_mtime_ns, stat.st_size, member)
+
+
+@functools.lru_cache(maxsize=256)
+def _read_rom_file(path, mtime_ns, size, member):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            if member is None:
+                names = [name for name in archive.namelist()
+                         if name.lower().endswith('.ch8')]
+
+                if len(names) != 1:
+                    raise RomError(f'{path} needs a member name')
+
+                member = names[0]
+
+            try:
+                return archive.read(member)
+            except KeyError:
+                raise RomError(f'{member} not found in {path}') from None
+
+    with open(path, 'rb') as rom:
+        return rom.read()
 
 
 class Chip8:
-    def __init__(self):
+    __slots__ = (
+        'opcode', 'memory', 'gfx', 'regs', 'index', 'pc',
+        'delay_timer', 'sound_timer', 'draw_flag', 'stack', 'sp', 'keys',
+        'write_listeners', 'cycles', 'cpu_hz', 'timer_hz', 'timer_phase',
+        'stop_reason', 'rng', 'skipped',
+    )
+
+    _decode_table = None  # built once per class on first instantiation
+
+    def __init__(self, seed=None):
         self.opcode = 0
-        self.memory = [0x0] * 4096
-        self.gfx = [0] * 2048  # graphics
-        self.regs = [0] * 16  # registers
+        self.memory = bytearray(4096)
+        self.gfx = FrameBuffer(64, 32)  # graphics
+        self.regs = bytearray(16)  # registers
         self.index = 0
         self.pc = 0x0200  # program_counter
 
@@ -14,10 +120,28 @@ class Chip8:
         self.sound_timer = 0
         self.draw_flag = False
 
-        self.stack = [0] * 16
+        self.stack = array('H', bytes(32))
         self.sp = 0  # stack_pointer
 
-        self.keys = [0] * 16
+        self.keys = bytearray(16)
+
+        # callables notified with (address, length) after memory writes
+        self.write_listeners = []
+
+        self.cycles = 0  # instructions executed
+        self.skipped = 0  # of those, skipped over by run() in idle loops
+        self.cpu_hz = 600  # instructions per second for run()
+        self.timer_hz = 60
+        self.timer_phase = 0  # instructions since the last timer tick
+        self.stop_reason = None
+
+        # CXNN draws from this, so a seeded machine is reproducible
+        self.rng = random.Random(seed)
+
+        cls = type(self)
+
+        if cls.__dict__.get('_decode_table') is None:
+            cls._decode_table = cls.build_decode_table()
 
     @property
     def vxi(self):
@@ -39,29 +163,115 @@ class Chip8:
     def nnn(self):
         return self.opcode & 0x0FFF
 
-    def load_rom(self, path: str):
-        counter = 0
+    def load_rom(self, source, member=None):
+        """
+        copy a rom into memory at pc, see read_rom for the accepted sources
+        """
+        data = read_rom(source, member)
+        start = self.pc
 
-        with open(path, 'rb') as rom:
-            while True:
-                chunk = rom.read(1)
+        if not data:
+            raise RomError('rom is empty')
 
-                if not chunk:
-                    break
+        if start + len(data) > len(self.memory):
+            raise RomError(f'rom is {len(data)} bytes, '
+                           f'only {len(self.memory) - start} fit')
 
-                self.memory[self.pc + counter] = chunk[0]
-                counter += 1
+        self.memory[start:start + len(data)] = data
 
-    def draw_console(self):
-        for y in range(0, 32):
-            for x in range(0, 64):
-                if self.gfx[x + y * 64]:
-                    print('█', end='')
-                else:
-                    print(' ', end='')
+        if self.write_listeners:
+            self.notify_write(start, len(data))
 
-                if x == 63:
-                    print()
+    def notify_write(self, address, length):
+        for listener in self.write_listeners:
+            listener(address, length)
+
+    def snapshot(self):
+        """
+        return the whole machine state as one bytes blob:
+        header, memory, packed framebuffer, registers, stack, keys and
+        the rng state, so CXNN draws the same values after a restore
+        """
+        gfx = self.gfx
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, len(self.memory), gfx.width, gfx.height,
+            self.opcode, self.index, self.pc, self.sp,
+            self.delay_timer, self.sound_timer, self.cycles, self.timer_phase,
+        )
+        stack = struct.pack(f'<{len(self.stack)}H', *self.stack)
+        rng = SNAPSHOT_RNG.pack(*self.rng.getstate()[1])
+        return b''.join((header, self.memory, gfx.to_bytes(), self.regs,
+                         stack, self.keys, rng))
+
+    def restore(self, blob):
+        """
+        load a blob made by snapshot() back into this machine
+        """
+        view = memoryview(blob)
+        gfx = self.gfx
+
+        try:
+            (magic, memory_size, width, height, opcode, index, pc, sp,
+             delay_timer, sound_timer, cycles, timer_phase
+             ) = SNAPSHOT_HEADER.unpack_from(view)
+        except struct.error:
+            raise SnapshotError('truncated header') from None
+
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError('bad magic')
+
+        if (memory_size, width, height) != (len(self.memory), gfx.width,
+                                            gfx.height):
+            raise SnapshotError('machine layout differs')
+
+        stack_size = 2 * len(self.stack)
+        start = SNAPSHOT_HEADER.size
+        sizes = (memory_size, width * height // 8, len(self.regs),
+                 stack_size, len(self.keys), SNAPSHOT_RNG.size)
+
+        if len(view) != start + sum(sizes):
+            raise SnapshotError('size mismatch')
+
+        parts = []
+
+        for size in sizes:
+            parts.append(view[start:start + size])
+            start += size
+
+        memory, packed, regs, stack, keys, rng = parts
+
+        if self.memory != memory:
+            self.memory[:] = memory
+
+            if self.write_listeners:
+                self.notify_write(0, memory_size)
+
+        gfx.load_bytes(packed)
+        self.regs[:] = regs
+        stack = struct.unpack(f'<{stack_size // 2}H', stack)
+        self.stack[:] = array('H', stack)
+        self.keys[:] = keys
+        self.rng.setstate((3, SNAPSHOT_RNG.unpack(rng), None))
+
+        self.opcode = opcode
+        self.index = index
+        self.pc = pc
+        self.sp = sp
+        self.delay_timer = delay_timer
+        self.sound_timer = sound_timer
+        self.cycles = cycles
+        self.timer_phase = timer_phase
+
+    def save_state(self, path: str):
+        with open(path, 'wb') as state:
+            state.write(self.snapshot())
+
+    def load_state(self, path: str):
+        with open(path, 'rb') as state:
+            self.restore(state.read())
+
+    def draw_console(self):
+        print(self.gfx.render())
 
     def press_key(self, key):
         self.keys[key] = 1
@@ -72,9 +282,9 @@ class Chip8:
     def emulate_cycle(self):
         self.draw_flag = False
         self.fetch_opcode()
-        # print(hex(self.opcode))
         self.pc += 2
         self.decode_opcode()
+        self.cycles += 1
 
         if self.delay_timer > 0:
             self.delay_timer -= 1
@@ -82,104 +292,364 @@ class Chip8:
         if self.sound_timer > 0:
             self.sound_timer -= 1
 
+    @property
+    def cycles_per_tick(self):
+        return max(1, round(self.cpu_hz / self.timer_hz))
+
+    def run(self, cycles, until=(), breakpoints=(), tick=True,
+            skip_idle=True):
+        """
+        execute up to cycles instructions, counting the timers down at
+        timer_hz relative to cpu_hz instead of once per instruction,
+        with tick=False the timers are left to tick_timers()
+
+        loops that only wait, see idle_loop, are skipped over in one
+        step when skip_idle is set, the outcome is the same as running
+        them instruction by instruction, the skipped instructions count
+        in cycles and in skipped, cycles - skipped were really executed
+
+        until may contain:
+        'draw'      stop after an instruction that drew to the screen
+        'key_wait'  stop before FX0A when no key is pressed
+        'halt'      stop after a jump to itself
+        'idle'      stop after closing a loop that can only be left by
+                    a key event or a timer tick from the host
+        execution also stops before an instruction at a breakpoint pc,
+        unless it is the first one of the batch, idle loops are not
+        skipped when there are breakpoints
+
+        return the number of instructions executed,
+        stop_reason tells why the batch ended early or is None
+        """
+        cls = type(self)
+        table = self._decode_table
+        memory = self.memory
+        keys = self.keys
+        per_tick = self.cycles_per_tick if tick else -1
+        # reduced again, cpu_hz may have changed since the last batch
+        phase = self.timer_phase % per_tick if tick else self.timer_phase
+        stop_draw = 'draw' in until
+        stop_key_wait = 'key_wait' in until
+        stop_halt = 'halt' in until
+        stop_idle = 'idle' in until
+        breakpoints = frozenset(breakpoints)
+        idle = (skip_idle or stop_idle) and not breakpoints
+        checks = stop_draw or stop_key_wait or stop_halt or breakpoints
+        load_key_pressed = cls.load_key_pressed
+        goto = cls.goto
+        reason = None
+        done = 0
+        self.draw_flag = False
+
+        try:
+            if not checks and not idle:
+                # nothing to look at between instructions, keep the loop lean
+                while done < cycles:
+                    pc = self.pc
+                    opcode = memory[pc] << 8 | memory[pc + 1]
+                    entry = table[opcode]
+
+                    if entry is None:
+                        self.opcode = opcode
+                        raise DecodeError(hex(opcode))
+
+                    self.opcode = opcode
+                    self.pc = pc + 2
+                    entry[0](self, *entry[1])
+                    done += 1
+                    phase += 1
+
+                    if phase == per_tick:
+                        phase = 0
+
+                        if self.delay_timer > 0:
+                            self.delay_timer -= 1
+
+                        if self.sound_timer > 0:
+                            self.sound_timer -= 1
+            else:
+                while done < cycles:
+                    pc = self.pc
+                    opcode = memory[pc] << 8 | memory[pc + 1]
+                    entry = table[opcode]
+
+                    if entry is None:
+                        self.opcode = opcode
+                        raise DecodeError(hex(opcode))
+
+                    handler, operands = entry
+
+                    if checks:
+                        if done and pc in breakpoints:
+                            reason = 'breakpoint'
+                            break
+
+                        if (stop_key_wait and handler is load_key_pressed
+                                and not any(keys)):
+                            reason = 'key_wait'
+                            break
+
+                    self.opcode = opcode
+                    self.pc = pc + 2
+                    handler(self, *operands)
+                    done += 1
+                    phase += 1
+
+                    if phase == per_tick:
+                        phase = 0
+
+                        if self.delay_timer > 0:
+                            self.delay_timer -= 1
+
+                        if self.sound_timer > 0:
+                            self.sound_timer -= 1
+
+                    if checks:
+                        if stop_draw and self.draw_flag:
+                            reason = 'draw'
+                            break
+
+                        if stop_halt and handler is goto and self.pc == pc:
+                            reason = 'halt'
+                            break
+
+                    if (handler is goto and idle and pc - 4 <= self.pc <= pc
+                            and memory[self.pc] >> 4 in IDLE_HEADS):
+                        skip, wait = self.idle_loop(pc, cycles - done,
+                                                    per_tick, phase)
+
+                        if wait and stop_idle:
+                            reason = 'idle'
+                            break
+
+                        if skip and skip_idle:
+                            done += skip
+                            self.skipped += skip
+
+                            if per_tick > 0:
+                                ticks, phase = divmod(phase + skip,
+                                                      per_tick)
+                                delay = self.delay_timer - ticks
+                                sound = self.sound_timer - ticks
+                                self.delay_timer = max(0, delay)
+                                self.sound_timer = max(0, sound)
+        finally:
+            self.cycles += done
+            self.stop_reason = reason
+
+            if tick:
+                self.timer_phase = phase % per_tick
+
+        return done
+
+    def idle_loop(self, pc, budget, per_tick, phase):
+        """
+        called after the jump at pc went back to self.pc, recognise the
+        loops that only wait:
+
+        1NNN              jump to itself
+        EX9E / EXA1, 1NNN wait for a key vX that does not change state
+        FX07, 3X00, 1NNN  wait for the delay timer to reach zero
+
+        return (skip, wait), skip is how many of the next budget
+        instructions, in whole loop iterations, can be skipped with only
+        the timers counting down, wait is True when the loop can only be
+        left by a key event or a timer tick from the host
+        """
+        target = self.pc
+        memory = self.memory
+
+        if pc == target:
+            return budget, True
+
+        if pc == target + 2:
+            hi = memory[target]
+            lo = memory[target + 1]
+            key = self.regs[hi & 0xF]
+
+            if hi >> 4 != 0xE or key > 0xF:
+                return 0, False
+
+            if (lo == 0x9E and not self.keys[key]
+                    or lo == 0xA1 and self.keys[key]):
+                return budget - budget % 2, True
+
+            return 0, False
+
+        if pc == target + 4:
+            hi = memory[target]
+            x = hi & 0xF
+            delay = self.delay_timer
+
+            if (hi >> 4 != 0xF or memory[target + 1] != 0x07
+                    or memory[target + 2] != 0x30 | x
+                    or memory[target + 3] != 0x00 or delay == 0):
+                return 0, False
+
+            if per_tick < 0:
+                return budget - budget % 3, True
+
+            # FX07 runs first in every iteration, the loop is left by the
+            # first one after the tick that takes the delay timer to zero
+            zero = per_tick - phase + (delay - 1) * per_tick
+            iterations = min((zero - 1) // 3 + 1, budget // 3)
+
+            if iterations:
+                last = 3 * (iterations - 1)
+                self.regs[x] = delay - (phase + last) // per_tick
+
+            return 3 * iterations, False
+
+        return 0, False
+
+    def run_frame(self, until=(), breakpoints=()):
+        """
+        execute the instructions left until the next timer tick
+        """
+        per_tick = self.cycles_per_tick
+        return self.run(per_tick - self.timer_phase % per_tick,
+                        until, breakpoints)
+
+    def tick_timers(self):
+        """
+        count both timers down once, for hosts that tick them on a clock
+        """
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+
     def fetch_opcode(self):
         self.opcode = self.memory[self.pc] << 8 | self.memory[self.pc + 1]
 
     def decode_opcode(self):
-        match self.opcode & 0xF000:
+        entry = self._decode_table[self.opcode]
+
+        if entry is None:
+            raise DecodeError(hex(self.opcode))
+
+        handler, operands = entry
+        handler(self, *operands)
+
+    @classmethod
+    def build_decode_table(cls):
+        """
+        map every 16-bit opcode to its handler and pre-extracted operands,
+        invalid opcodes map to None
+        """
+        shared = {}
+        table = []
+
+        for opcode in range(0x10000):
+            entry = cls.decode_entry(opcode)
+
+            if entry is not None:
+                handler, operands = entry
+                operands = shared.setdefault(operands, operands)
+                entry = (handler, operands)
+
+            table.append(entry)
+
+        return table
+
+    @classmethod
+    def decode_entry(cls, opcode):
+        """
+        return (handler, operands) for opcode, or None if it is invalid
+        """
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+        n = opcode & 0x000F
+        nn = opcode & 0x00FF
+        nnn = opcode & 0x0FFF
+
+        match opcode & 0xF000:
             case 0x0000:
-                match self.opcode & 0x00FF:
-                    case 0x00E0:
-                        self.clear_screen()
-                    case 0x00EE:
-                        self.ret()
-                    case _:
-                        raise DecodeError(hex(self.opcode))
+                match nn:
+                    case 0xE0:
+                        return cls.clear_screen, ()
+                    case 0xEE:
+                        return cls.ret, ()
             case 0x1000:
-                self.goto()
+                return cls.goto, (nnn,)
             case 0x2000:
-                self.call()
+                return cls.call, (nnn,)
             case 0x3000:
-                self.skip_equal()
+                return cls.skip_equal, (x, nn)
             case 0x4000:
-                self.skip_not_equal()
+                return cls.skip_not_equal, (x, nn)
             case 0x5000:
-                self.skip_equal_reg()
+                return cls.skip_equal_reg, (x, y)
             case 0x6000:
-                self.load_reg()
+                return cls.load_reg, (x, nn)
             case 0x7000:
-                self.add_constant()
+                return cls.add_constant, (x, nn)
             case 0x8000:
-                match self.opcode & 0x000F:
-                    case 0x0000:
-                        self.set_reg()
-                    case 0x0001:
-                        self.bitwise_or()
-                    case 0x0002:
-                        self.bitwise_and()
-                    case 0x0003:
-                        self.bitwise_xor()
-                    case 0x0004:
-                        self.add()
-                    case 0x0005:
-                        self.sub()
-                    case 0x0006:
-                        self.shr()
-                    case 0x0007:
-                        self.subn()
-                    case 0x000E:
-                        self.shl()
-                    case _:
-                        raise DecodeError(hex(self.opcode))
+                match n:
+                    case 0x0:
+                        return cls.set_reg, (x, y)
+                    case 0x1:
+                        return cls.bitwise_or, (x, y)
+                    case 0x2:
+                        return cls.bitwise_and, (x, y)
+                    case 0x3:
+                        return cls.bitwise_xor, (x, y)
+                    case 0x4:
+                        return cls.add, (x, y)
+                    case 0x5:
+                        return cls.sub, (x, y)
+                    case 0x6:
+                        return cls.shr, (x, y)
+                    case 0x7:
+                        return cls.subn, (x, y)
+                    case 0xE:
+                        return cls.shl, (x, y)
             case 0x9000:
-                self.skip_reg_not_equal()
+                return cls.skip_reg_not_equal, (x, y)
             case 0xA000:
-                self.load_index()
+                return cls.load_index, (nnn,)
             case 0xB000:
-                self.jump()
+                return cls.jump, (nnn,)
             case 0xC000:
-                self.random_value()
+                return cls.random_value, (x, nn)
             case 0xD000:
-                self.draw()
+                return cls.draw, (x, y, n)
             case 0xE000:
-                match self.opcode & 0x00FF:
-                    case 0x009E:
-                        self.skip_key_pressed()
-                    case 0x00A1:
-                        self.skip_key_not_pressed()
-                    case _:
-                        raise DecodeError(hex(self.opcode))
+                match nn:
+                    case 0x9E:
+                        return cls.skip_key_pressed, (x,)
+                    case 0xA1:
+                        return cls.skip_key_not_pressed, (x,)
             case 0xF000:
-                match self.opcode & 0x00FF:
-                    case 0x0007:
-                        self.load_delay()
-                    case 0x000A:
-                        self.load_key_pressed()
-                    case 0x0015:
-                        self.set_delay()
-                    case 0x0018:
-                        self.set_sound()
-                    case 0x001E:
-                        self.add_index()
-                    case 0x0029:
-                        self.load_hex_sprite()
-                    case 0x0033:
-                        self.store_bcd()
-                    case 0x0055:
-                        self.store_regs()
-                    case 0x0065:
-                        self.read_regs()
-                    case _:
-                        raise DecodeError(hex(self.opcode))
-            case _:
-                raise DecodeError(hex(self.opcode))
+                match nn:
+                    case 0x07:
+                        return cls.load_delay, (x,)
+                    case 0x0A:
+                        return cls.load_key_pressed, (x,)
+                    case 0x15:
+                        return cls.set_delay, (x,)
+                    case 0x18:
+                        return cls.set_sound, (x,)
+                    case 0x1E:
+                        return cls.add_index, (x,)
+                    case 0x29:
+                        return cls.load_hex_sprite, (x,)
+                    case 0x33:
+                        return cls.store_bcd, (x,)
+                    case 0x55:
+                        return cls.store_regs, (x,)
+                    case 0x65:
+                        return cls.read_regs, (x,)
+
+        return None
 
     # 00E0 TESTED
     def clear_screen(self):
         """
         clear the screen
         """
-        self.gfx = [0] * 2048
+        self.gfx.clear()
 
     # 00EE TESTED
     def ret(self):
@@ -190,303 +660,620 @@ class Chip8:
         self.pc = self.stack[self.sp]
 
     # 1NNN TESTED
-    def goto(self):
+    def goto(self, nnn):
         """
         jump to location nnn
         """
-        self.pc = self.nnn
+        self.pc = nnn
 
     # 2NNN TESTED
-    def call(self):
+    def call(self, nnn):
         """
         call subroutine at nnn
         """
         self.stack[self.sp] = self.pc
         self.sp += 1
-        self.pc = self.nnn
+        self.pc = nnn
 
     # 3XNN TESTED
-    def skip_equal(self):
+    def skip_equal(self, x, nn):
         """
         skip next instruction if vX = NN
         """
-        if self.regs[self.vxi] == self.nn:
+        if self.regs[x] == nn:
             self.pc += 2
 
     # 4XNN TESTED
-    def skip_not_equal(self):
+    def skip_not_equal(self, x, nn):
         """
         skip next instruction if vX != NN
         """
-        if self.regs[self.vxi] != self.nn:
+        if self.regs[x] != nn:
             self.pc += 2
 
     # 5XY0 TESTED
-    def skip_equal_reg(self):
+    def skip_equal_reg(self, x, y):
         """
         skip next instruction if vX = vY
         """
-        if self.regs[self.vxi] == self.regs[self.vyi]:
+        if self.regs[x] == self.regs[y]:
             self.pc += 2
 
     # 6XNN TESTED
-    def load_reg(self):
+    def load_reg(self, x, nn):
         """
         set vX = NN
         """
-        self.regs[self.vxi] = self.nn
+        self.regs[x] = nn
 
     # 7XNN TESTED
-    def add_constant(self):
+    def add_constant(self, x, nn):
         """
         set vX = vX + NN
         """
-        val = self.regs[self.vxi] + self.nn
-        self.regs[self.vxi] = val & 0xFF
+        regs = self.regs
+        regs[x] = (regs[x] + nn) & 0xFF
 
     # 8XY0 TESTED
-    def set_reg(self):
+    def set_reg(self, x, y):
         """
         set vX to the value of vY
         """
-        self.regs[self.vxi] = self.regs[self.vyi]
+        self.regs[x] = self.regs[y]
 
     # 8XY1 TESTED
-    def bitwise_or(self):
+    def bitwise_or(self, x, y):
         """
         set vX = vX OR vY
         """
-        self.regs[self.vxi] = self.regs[self.vxi] | self.regs[self.vyi]
+        regs = self.regs
+        regs[x] = regs[x] | regs[y]
 
     # 8XY2 TESTED
-    def bitwise_and(self):
+    def bitwise_and(self, x, y):
         """
         set vX = vX AND vY
         """
-        self.regs[self.vxi] = self.regs[self.vxi] & self.regs[self.vyi]
+        regs = self.regs
+        regs[x] = regs[x] & regs[y]
 
     # 8XY3 TESTED
-    def bitwise_xor(self):
+    def bitwise_xor(self, x, y):
         """
         set vX = vX XOR vY
         """
-        self.regs[self.vxi] = self.regs[self.vxi] ^ self.regs[self.vyi]
+        regs = self.regs
+        regs[x] = regs[x] ^ regs[y]
 
     # 8XY4 TESTED
-    def add(self):
+    def add(self, x, y):
         """
         set vX = vX + vY, set vF = 1 if vX > 255
         """
-        val = self.regs[self.vxi] + self.regs[self.vyi]
-        self.regs[self.vxi] = val & 0xFF
+        regs = self.regs
+        val = regs[x] + regs[y]
+        regs[x] = val & 0xFF
 
         if val > 0xFF:
-            self.regs[0xF] = 0x1
+            regs[0xF] = 0x1
         else:
-            self.regs[0xF] = 0x0
+            regs[0xF] = 0x0
 
     # 8XY5 TESTED
-    def sub(self):
+    def sub(self, x, y):
         """
         set vF = 1 if vX > vY, set vX = vX - vY
         """
-        val_0 = self.regs[self.vxi]
-        val_1 = self.regs[self.vxi] - self.regs[self.vyi]
-        self.regs[self.vxi] = val_1 & 0xFF
+        regs = self.regs
+        val_0 = regs[x]
+        val_1 = regs[x] - regs[y]
+        regs[x] = val_1 & 0xFF
 
-        if val_0 >= self.regs[self.vyi]:
-            self.regs[0xF] = 0x1
+        if val_0 >= regs[y]:
+            regs[0xF] = 0x1
         else:
-            self.regs[0xF] = 0x0
+            regs[0xF] = 0x0
 
     # 8XY6 TESTED
-    def shr(self):
+    def shr(self, x, y):
         """
         set vX = vY
         if the least-significant bit of vX is 1, then vF = 1
         shift vX one bit to the right
         """
-        # self.regs[self.vxi] = self.regs[self.vyi]
+        # self.regs[x] = self.regs[y]
 
-        val = self.regs[self.vxi]
-        self.regs[self.vxi] = (self.regs[self.vxi] >> 1) & 0xFF
-        self.regs[0xF] = val & 0x1
+        regs = self.regs
+        val = regs[x]
+        regs[x] = (regs[x] >> 1) & 0xFF
+        regs[0xF] = val & 0x1
 
     # 8XY7 TESTED
-    def subn(self):
+    def subn(self, x, y):
         """
         set vF = 1 if vY > vX, set vX = vY - vX
         """
-        val = self.regs[self.vyi] - self.regs[self.vxi]
-        self.regs[self.vxi] = val & 0xFF
+        regs = self.regs
+        val = regs[y] - regs[x]
+        regs[x] = val & 0xFF
 
-        if self.regs[self.vyi] > self.regs[self.vxi]:
-            self.regs[0xF] = 0x1
+        if regs[y] > regs[x]:
+            regs[0xF] = 0x1
         else:
-            self.regs[0xF] = 0x0
+            regs[0xF] = 0x0
 
     # 8XYE TESTED
-    def shl(self):
+    def shl(self, x, y):
         """
         set vX = vY
         if the most-significant bit of vX is 1, then vF = 1
         shift vX one bit to the left
         """
-        # self.regs[self.vxi] = self.regs[self.vyi]
+        # self.regs[x] = self.regs[y]
 
-        val = self.regs[self.vxi]
-        self.regs[self.vxi] = (self.regs[self.vxi] << 1) & 0xFF
-        self.regs[0xF] = (val & 0x80) >> 7
+        regs = self.regs
+        val = regs[x]
+        regs[x] = (regs[x] << 1) & 0xFF
+        regs[0xF] = (val & 0x80) >> 7
 
     # 9XY0 TESTED
-    def skip_reg_not_equal(self):
+    def skip_reg_not_equal(self, x, y):
         """
         skip next instruction if vX != vY
         """
-        if self.regs[self.vxi] != self.regs[self.vyi]:
+        if self.regs[x] != self.regs[y]:
             self.pc += 2
 
     # ANNN TESTED
-    def load_index(self):
+    def load_index(self, nnn):
         """
         set I to NNN
         """
-        self.index = self.nnn
+        self.index = nnn
 
     # BNNN
-    def jump(self):
+    def jump(self, nnn):
         """
         jump to address NNN + v0
         """
-        self.pc = self.regs[0] + self.nnn
+        self.pc = self.regs[0] + nnn
 
     # CXNN
-    def random_value(self):
+    def random_value(self, x, nn):
         """
         set vX to a random value masked (bitwise AND) with NN
         """
-        result = random.randint(0, 255) & self.nn
-        self.regs[self.vxi] = result
+        result = self.rng.randint(0, 255) & nn
+        self.regs[x] = result
 
     # DXYN TESTED
-    def draw(self):
+    def draw(self, x, y, n):
         """
         draw 8xN pixel sprite at position vX, vY
         with data starting at the address in I
         set vF = collision
         """
-        x = self.vxi
-        x_pos = self.regs[x] % 64
-        y = self.vyi
-        y_pos = self.regs[y] % 32
-        height = self.n
-        self.regs[0xF] = 0
-
-        for row in range(0, height):
-            pixel = self.memory[self.index + row]
-
-            for col in range(0, 8):
-                if (pixel & (0x80 >> col)) != 0:
-                    pix = x_pos + col + ((y_pos + row) * 64)
-                    # print('>>>>>>>>', pix % 2048)
-
-                    if self.gfx[pix % 2048] == 1:
-                        self.regs[0xF] = 1
+        regs = self.regs
+        start = self.index
 
-                    self.gfx[pix % 2048] ^= 1
+        if start + n > len(self.memory):
+            raise IndexError('sprite data out of range')
 
+        gfx = self.gfx
+        sprite = self.memory[start:start + n]
+        regs[0xF] = gfx.blit_wrap(regs[x] % gfx.width, regs[y] % gfx.height,
+                                  sprite)
         self.draw_flag = True
 
     # EX9E
-    def skip_key_pressed(self):
+    def skip_key_pressed(self, x):
         """
         skip next instruction if key with the value of vX is pressed
         """
-        if self.keys[self.regs[self.vxi]] == 1:
+        if self.keys[self.regs[x]] == 1:
             self.pc += 2
 
     # EXA1
-    def skip_key_not_pressed(self):
+    def skip_key_not_pressed(self, x):
         """
         skip next instruction if key with the value of vX is not pressed
         """
-        if self.keys[self.regs[self.vxi]] == 0:
+        if self.keys[self.regs[x]] == 0:
             self.pc += 2
 
     # FX07
-    def load_delay(self):
+    def load_delay(self, x):
         """
         set vX = delay timer value
         """
-        self.regs[self.vxi] = self.delay_timer & 0xFF
+        self.regs[x] = self.delay_timer & 0xFF
 
     # FX0A
-    def load_key_pressed(self):
+    def load_key_pressed(self, x):
         """
         set vX = key pressed
         """
         for key in range(0, 16):
             if self.keys[key]:
-                self.regs[self.vxi] = key & 0xFF
+                self.regs[x] = key & 0xFF
                 break
 
     # FX15
-    def set_delay(self):
+    def set_delay(self, x):
         """
         set delay timer value = vX
         """
-        self.delay_timer = self.regs[self.vxi] & 0xFF
+        self.delay_timer = self.regs[x] & 0xFF
 
     # FX18
-    def set_sound(self):
+    def set_sound(self, x):
         """
         set sound timer value = vX
         """
-        self.sound_timer = self.regs[self.vxi] & 0xFF
+        self.sound_timer = self.regs[x] & 0xFF
 
     # FX1E TESTED
-    def add_index(self):
+    def add_index(self, x):
         """
         set I = I + vX
         """
-        self.index = self.index + self.regs[self.vxi]
+        self.index = self.index + self.regs[x]
 
     # FX29
-    def load_hex_sprite(self):
+    def load_hex_sprite(self, x):
         """
         set I = location of sprite for digit vX
         """
 
     # FX33 TESTED
-    def store_bcd(self):
+    def store_bcd(self, x):
         """
         store BCD representation of vX in memory locations I, I+1, and I+2
         """
-        hundred = self.regs[self.vxi] // 100 % 10
-        ten = self.regs[self.vxi] // 10 % 10
-        one = self.regs[self.vxi] % 10
+        val = self.regs[x]
+        hundred = val // 100 % 10
+        ten = val // 10 % 10
+        one = val % 10
 
         self.memory[self.index] = hundred
         self.memory[self.index + 1] = ten
         self.memory[self.index + 2] = one
 
+        if self.write_listeners:
+            self.notify_write(self.index, 3)
+
     # FX55 TESTED
-    def store_regs(self):
+    def store_regs(self, x):
         """
         store registers v0 through vX in memory starting at location I
         """
-        for i in range(self.vxi + 1):
+        for i in range(x + 1):
             self.memory[self.index + i] = self.regs[i]
 
+        if self.write_listeners:
+            self.notify_write(self.index, x + 1)
+
     # FX65 TESTED
-    def read_regs(self):
+    def read_regs(self, x):
         """
         read registers v0 through vX from memory starting at location I
         """
-        for i in range(self.vxi + 1):
+        for i in range(x + 1):
             self.regs[i] = self.memory[self.index + i]
 
 
+class FrameBuffer:
+    """
+    monochrome display packed as one int per row,
+    the leftmost pixel of a row is its most significant bit
+
+    indexing with x + y * width reads and writes single pixels
+    like the flat list of pixels it replaces
+
+    dirty is a bitmask of the rows changed since the last take_dirty(),
+    bit y set meaning row y changed
+    """
+    __slots__ = ('width', 'height', 'rows', 'dirty')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.rows = [0] * height
+        self.dirty = (1 << height) - 1
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+
+        y, x = divmod(self._position(i), self.width)
+        return (self.rows[y] >> (self.width - 1 - x)) & 1
+
+    def __setitem__(self, i, value):
+        y, x = divmod(self._position(i), self.width)
+        bit = 1 << (self.width - 1 - x)
+
+        if value:
+            self.rows[y] |= bit
+        else:
+            self.rows[y] &= ~bit
+
+        self.dirty |= 1 << y
+
+    def __iter__(self):
+        width = self.width
+
+        for row in self.rows:
+            for shift in range(width - 1, -1, -1):
+                yield (row >> shift) & 1
+
+    def _position(self, i):
+        size = self.width * self.height
+
+        if i < 0:
+            i += size
+
+        if not 0 <= i < size:
+            raise IndexError('pixel index out of range')
+
+        return i
+
+    def clear(self):
+        for y, row in enumerate(self.rows):
+            if row:
+                self.dirty |= 1 << y
+
+        self.rows = [0] * self.height
+
+    def take_dirty(self):
+        """
+        return the dirty row mask and start tracking from scratch
+        """
+        dirty = self.dirty
+        self.dirty = 0
+        return dirty
+
+    def to_bytes(self):
+        """
+        return the pixels packed 8 per byte, row by row, msb first
+        """
+        size = self.width // 8
+
+        if size == 8:
+            return struct.pack(f'>{self.height}Q', *self.rows)
+
+        return b''.join(row.to_bytes(size, 'big') for row in self.rows)
+
+    def load_bytes(self, data):
+        """
+        replace the pixels with data packed as by to_bytes()
+        """
+        size = self.width // 8
+
+        if size == 8:
+            self.rows = list(struct.unpack(f'>{self.height}Q', data))
+        else:
+            self.rows = [
+                int.from_bytes(data[i:i + size], 'big')
+                for i in range(0, size * self.height, size)
+            ]
+
+        self.dirty = (1 << self.height) - 1
+
+    def render_row(self, y, on='█', off=' '):
+        """
+        return row y as a string with one character per pixel
+        """
+        bits = format(self.rows[y], f'0{self.width}b')
+        return bits.replace('0', off).replace('1', on)
+
+    def render(self, on='█', off=' '):
+        """
+        return the whole display as one string, rows separated by newlines
+        """
+        spec = f'0{self.width}b'
+        bits = '\n'.join([format(row, spec) for row in self.rows])
+        return bits.replace('0', off).replace('1', on)
+
+    def digest(self):
+        """
+        return a 64-bit hash of the pixels that is stable across runs
+        and processes, for comparing frames against stored ones
+        """
+        return int.from_bytes(
+            hashlib.blake2b(self.to_bytes(), digest_size=8).digest(), 'big')
+
+    def to_pbm(self):
+        """
+        return the pixels as a binary PBM (P4) image, lit pixels black
+        """
+        header = f'P4\n{self.width} {self.height}\n'.encode('ascii')
+        return header + self.to_bytes()
+
+    def to_png(self):
+        """
+        return the pixels as a 1-bit grayscale PNG image, lit pixels white
+        """
+        size = self.width // 8
+        packed = self.to_bytes()
+        lines = b''.join(b'\0' + packed[i:i + size]
+                         for i in range(0, len(packed), size))
+
+        def chunk(kind, data):
+            crc = zlib.crc32(kind + data)
+            return (struct.pack('>I', len(data)) + kind + data
+                    + struct.pack('>I', crc))
+
+        header = struct.pack('>IIBBBBB', self.width, self.height, 1, 0, 0, 0,
+                             0)
+        return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+                + chunk(b'IDAT', zlib.compress(lines, 9))
+                + chunk(b'IEND', b''))
+
+    def save_pbm(self, path: str):
+        with open(path, 'wb') as image:
+            image.write(self.to_pbm())
+
+    def save_png(self, path: str):
+        with open(path, 'wb') as image:
+            image.write(self.to_png())
+
+    def blit_wrap(self, x, y, sprite):
+        """
+        XOR 8 pixel wide sprite rows at x, y, pixels past the right edge
+        continue on the next row and rows past the bottom on the top row
+        return 1 if a lit pixel was turned off, 0 otherwise
+        """
+        rows = self.rows
+        width = self.width
+        height = self.height
+        mask = (1 << width) - 1
+        shift = 2 * width - 8 - x
+        collision = 0
+        dirty = self.dirty
+
+        for line in sprite:
+            wide = line << shift
+            high = wide >> width
+            low = wide & mask
+
+            if rows[y] & high:
+                collision = 1
+
+            rows[y] ^= high
+
+            if high:
+                dirty |= 1 << y
+
+            y = (y + 1) % height
+
+            if low:
+                if rows[y] & low:
+                    collision = 1
+
+                rows[y] ^= low
+                dirty |= 1 << y
+
+        self.dirty = dirty
+        return collision
+
+    def blit_clip(self, x, y, sprite, width=8):
+        """
+        XOR sprite rows, width pixels wide, at x, y, pixels past the right
+        and bottom edges are dropped
+        return 1 if a lit pixel was turned off, 0 otherwise
+        """
+        rows = self.rows
+        shift = self.width - width - x
+        collision = 0
+        dirty = self.dirty
+
+        for line in sprite[:self.height - y]:
+            if shift >= 0:
+                line <<= shift
+            else:
+                line >>= -shift
+
+            if line:
+                if rows[y] & line:
+                    collision = 1
+
+                rows[y] ^= line
+                dirty |= 1 << y
+
+            y += 1
+
+        self.dirty = dirty
+        return collision
+
+    def blit_around(self, x, y, sprite, width=8):
+        """
+        XOR sprite rows, width pixels wide, at x, y, pixels past the right
+        edge come back on the left of the same row and rows past the
+        bottom on the top
+        return 1 if a lit pixel was turned off, 0 otherwise
+        """
+        rows = self.rows
+        height = self.height
+        mask = (1 << self.width) - 1
+        shift = self.width - width
+        collision = 0
+        dirty = self.dirty
+
+        for line in sprite:
+            line <<= shift
+            line = (line >> x | line << (self.width - x)) & mask
+
+            if line:
+                if rows[y] & line:
+                    collision = 1
+
+                rows[y] ^= line
+                dirty |= 1 << y
+
+            y = (y + 1) % height
+
+        self.dirty = dirty
+        return collision
+
+    def scroll(self, dx=0, dy=0):
+        """
+        move the pixels dx columns right and dy rows down, negative
+        values move them left and up, pixels moved past an edge are lost
+        """
+        rows = self.rows
+        height = self.height
+
+        if dx > 0:
+            rows = [row >> dx for row in rows]
+        elif dx < 0:
+            mask = (1 << self.width) - 1
+            rows = [(row << -dx) & mask for row in rows]
+
+        dy = max(-height, min(dy, height))
+
+        if dy > 0:
+            rows = [0] * dy + rows[:height - dy]
+        elif dy < 0:
+            rows = rows[-dy:] + [0] * -dy
+
+        self.rows = rows
+        self.dirty = (1 << height) - 1
+
+    def resize(self, width, height):
+        """
+        change the resolution, the display is cleared
+        """
+        self.width = width
+        self.height = height
+        self.rows = [0] * height
+        self.dirty = (1 << height) - 1
+
+
+class RomError(Exception):
+    """
+    use when a rom can not be read or does not fit in memory
+    """
+    def __init__(self, message):
+        self.message = f'rom could not be loaded: {message}'
+
+    def __str__(self):
+        return self.message
+
+
+class SnapshotError(Exception):
+    """
+    use when a snapshot blob does not fit the machine
+    """
+    def __init__(self, message):
+        self.message = f'snapshot could not be restored: {message}'
+
+    def __str__(self):
+        return self.message
+
+
 class DecodeError(Exception):
     """
     use when the opcode can not be decoded
@@ -0,0 +1,250 @@
+"""
+debugger
+
+pc breakpoints, optionally with a condition on the machine state,
+memory watchpoints and a trace log on top of Chip8.run:
+
+    debugger = Debugger(c8, trace=1000)
+    debugger.break_at(0x2A4, 'V3 == 0x10 and DT == 0')
+    debugger.watch(0x300, 3)
+    debugger.run(100000)
+
+conditions are python expressions over V0 - VF, I, PC, SP, DT, ST and
+M, the memory, as in M[I + 1] > 9, anything else is rejected
+
+with only breakpoints set the batch runs in Chip8.run, which checks
+the pc against the breakpoints and returns to evaluate a condition,
+watchpoints, the trace log and rewind step one instruction at a time,
+with nothing set run is Chip8.run itself
+"""
+import ast
+from collections import deque
+
+from .analyzer import mnemonic
+from .rewind import Rewinder
+
+NAMES = {f'V{x:X}' for x in range(16)} | {'I', 'PC', 'SP', 'DT', 'ST', 'M'}
+
+# no ** or <<, their results grow without bound and a condition like
+# 2 ** 10 ** 10 would hang the debugger
+NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare,
+    ast.Name, ast.Load, ast.Constant, ast.Subscript, ast.boolop,
+    ast.unaryop, ast.cmpop, ast.Add, ast.Sub, ast.Mult, ast.FloorDiv,
+    ast.Mod, ast.RShift, ast.BitAnd, ast.BitOr, ast.BitXor,
+)
+
+
+def compile_condition(text):
+    """
+    return the code object of a breakpoint condition
+    """
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError:
+        raise ConditionError(text) from None
+
+    for node in ast.walk(tree):
+        if not isinstance(node, NODES):
+            raise ConditionError(text)
+
+        if isinstance(node, ast.Name) and node.id not in NAMES:
+            raise ConditionError(f'{text}, unknown name {node.id}')
+
+        if isinstance(node, ast.Constant) and not isinstance(node.value, int):
+            raise ConditionError(text)
+
+    return compile(tree, '<condition>', 'eval')
+
+
+def machine_names(c8):
+    names = {f'V{x:X}': value for x, value in enumerate(c8.regs)}
+    names.update(I=c8.index, PC=c8.pc, SP=c8.sp, DT=c8.delay_timer,
+                 ST=c8.sound_timer, M=c8.memory)
+    names['__builtins__'] = {}
+    return names
+
+
+class Debugger:
+    """
+    stop a machine at breakpoints and watchpoints
+
+    stop_reason is 'breakpoint', 'watchpoint', a Chip8.stop_reason or
+    None when the whole batch ran, hit is the pc of the breakpoint or
+    the first watched address written
+
+    trace keeps the (cycle, pc, opcode) of the last trace instructions,
+    rewind records the run so back() can step it backwards
+    """
+    def __init__(self, chip8, trace=0, rewind=False):
+        self.chip8 = chip8
+        self.breakpoints = {}  # pc -> condition code or None
+        self.watchpoints = set()
+        self.trace = deque(maxlen=trace) if trace else None
+        self.rewinder = Rewinder(chip8) if rewind else None
+        self.written = []  # watched addresses written by the last step
+        self.stop_reason = None
+        self.hit = None
+
+    def break_at(self, pc, condition=None):
+        """
+        stop before the instruction at pc when condition, if any, holds
+        """
+        code = None if condition is None else compile_condition(condition)
+        self.breakpoints[pc] = code
+
+    def clear(self, pc=None):
+        """
+        remove the breakpoint at pc, every breakpoint by default
+        """
+        if pc is None:
+            self.breakpoints.clear()
+        else:
+            self.breakpoints.pop(pc, None)
+
+    def watch(self, address, length=1):
+        """
+        stop after an instruction writes memory at address up to
+        address + length
+        """
+        if not self.watchpoints:
+            self.chip8.write_listeners.append(self.on_write)
+
+        self.watchpoints.update(range(address, address + length))
+
+    def unwatch(self, address=None, length=1):
+        """
+        remove the watchpoints in [address, address + length), every
+        watchpoint by default
+        """
+        if address is None:
+            self.watchpoints.clear()
+        else:
+            self.watchpoints.difference_update(
+                range(address, address + length))
+
+        listeners = self.chip8.write_listeners
+
+        if not self.watchpoints and self.on_write in listeners:
+            listeners.remove(self.on_write)
+
+    def detach(self):
+        self.unwatch()
+
+        if self.rewinder is not None:
+            self.rewinder.detach()
+
+    def on_write(self, address, length):
+        watchpoints = self.watchpoints
+        self.written.extend(address + i for i in range(length)
+                            if address + i in watchpoints)
+
+    def condition_holds(self, pc):
+        code = self.breakpoints[pc]
+        return code is None or bool(eval(code, machine_names(self.chip8)))
+
+    def run(self, cycles):
+        """
+        execute up to cycles instructions, return how many were executed
+
+        the instruction at pc when the batch starts is never stopped at,
+        so run can be called again to continue from a breakpoint
+        """
+        self.stop_reason = None
+        self.hit = None
+
+        if (self.watchpoints or self.trace is not None
+                or self.rewinder is not None):
+            return self.run_steps(cycles)
+
+        c8 = self.chip8
+        breakpoints = self.breakpoints
+        done = 0
+
+        while done < cycles:
+            done += c8.run(cycles - done, breakpoints=breakpoints)
+
+            if c8.stop_reason != 'breakpoint':
+                self.stop_reason = c8.stop_reason
+                break
+
+            if self.condition_holds(c8.pc):
+                self.stop_reason = 'breakpoint'
+                self.hit = c8.pc
+                break
+
+            # the condition does not hold, run on past the breakpoint
+            done += c8.run(1)
+
+        return done
+
+    def run_steps(self, cycles):
+        c8 = self.chip8
+        breakpoints = self.breakpoints
+        trace = self.trace
+        written = self.written
+        step = c8.run if self.rewinder is None else self.rewinder.run
+        memory = c8.memory
+        done = 0
+
+        while done < cycles:
+            pc = c8.pc
+
+            if done and pc in breakpoints and self.condition_holds(pc):
+                self.stop_reason = 'breakpoint'
+                self.hit = pc
+                break
+
+            if trace is not None:
+                trace.append((c8.cycles, pc, memory[pc] << 8 | memory[pc + 1]))
+
+            written.clear()
+            step(1)
+            done += 1
+
+            if written:
+                self.stop_reason = 'watchpoint'
+                self.hit = written[0]
+                break
+
+        return done
+
+    def back(self, cycles=1):
+        """
+        undo the last cycles instructions, return how many were undone
+        """
+        if self.rewinder is None:
+            raise ValueError('the debugger was created without rewind')
+
+        done = self.rewinder.step_back(cycles)
+        trace = self.trace
+
+        while trace and trace[-1][0] >= self.chip8.cycles:
+            trace.pop()
+
+        return done
+
+    def trace_lines(self):
+        """
+        return the trace log as disassembly, oldest first
+        """
+        table = self.chip8._decode_table
+        lines = []
+
+        for cycle, pc, opcode in self.trace or ():
+            entry = table[opcode]
+            text = '??' if entry is None else mnemonic(*entry)
+            lines.append(f'{cycle:>8}  {pc:03x}  {opcode:04x}  {text}')
+
+        return lines
+
+
+class ConditionError(Exception):
+    """
+    use when a breakpoint condition can not be parsed
+    """
+    def __init__(self, message):
+        self.message = f'breakpoint condition could not be parsed: {message}'
+
+    def __str__(self):
+        return self.message
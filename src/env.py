@@ -0,0 +1,138 @@
+"""
+reinforcement learning environment
+
+a gym style wrapper around one machine:
+
+    env = Chip8Env('3-corax+.ch8', frame_skip=4)
+    observation, info = env.reset(seed=0)
+    observation, reward, terminated, truncated, info = env.step(action)
+
+an action holds one key down for the whole step, action 0 is no key,
+action k + 1 is key k unless actions lists other keys, a step runs
+frame_skip frames of cycles_per_tick instructions through Chip8.run
+
+the observation is a uint8 array of the display, one pixel per byte,
+allocated once and refilled in place, only when the display changed,
+copy it to keep a frame past the next step
+
+reset restores the state right after load_rom and boot_cycles
+instructions, snapshots are cached by rom, profile and seed, so an
+episode never reads or loads the rom again
+"""
+import functools
+
+import numpy as np
+
+from .chip8 import read_rom
+from .quirks import machine
+
+# row i holds the 8 pixels of byte value i, msb first
+BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+
+
+@functools.lru_cache(maxsize=64)
+def boot_snapshot(image, profile, seed, boot_cycles):
+    c8 = machine(profile, seed)
+    c8.load_rom(image)
+    c8.run(boot_cycles)
+    return c8.snapshot()
+
+
+def halted(c8):
+    """
+    True when the instruction at pc is a jump to itself
+    """
+    pc = c8.pc
+    opcode = c8.memory[pc] << 8 | c8.memory[pc + 1]
+    return opcode == 0x1000 | pc
+
+
+class Chip8Env:
+    """
+    reward is called with the machine after every step and returns the
+    reward, terminated is called the same way, a jump to itself also
+    ends the episode, max_steps truncates it
+    """
+    def __init__(self, rom, frame_skip=4, actions=None, profile='chip8',
+                 seed=0, boot_cycles=0, reward=None, terminated=None,
+                 max_steps=None):
+        self.boot = (read_rom(rom), profile, seed, boot_cycles)
+        self.chip8 = machine(profile, seed)
+        self.frame_skip = frame_skip
+        self.actions = [None] + list(actions if actions is not None
+                                     else range(16))
+        self.reward = reward
+        self.terminated = terminated
+        self.max_steps = max_steps
+        self.steps = 0
+        self.key = None
+        gfx = self.chip8.gfx
+        self.packed = np.zeros((gfx.height, gfx.width // 8), np.uint8)
+        self.observation = np.zeros((gfx.height, gfx.width), np.uint8)
+
+    @property
+    def action_count(self):
+        return len(self.actions)
+
+    def reset(self, seed=None):
+        """
+        return the machine to its boot state, return (observation, info)
+        """
+        c8 = self.chip8
+        c8.restore(boot_snapshot(*self.boot))
+
+        if seed is not None:
+            c8.rng.seed(seed)
+
+        self.steps = 0
+        self.key = None
+        return self.observe(), self.info()
+
+    def step(self, action):
+        """
+        hold the key of action down for frame_skip frames, return
+        (observation, reward, terminated, truncated, info)
+        """
+        c8 = self.chip8
+        key = self.actions[action]
+
+        if key != self.key:
+            if self.key is not None:
+                c8.release_key(self.key)
+
+            if key is not None:
+                c8.press_key(key)
+
+            self.key = key
+
+        per_tick = c8.cycles_per_tick
+        c8.run(self.frame_skip * per_tick - c8.timer_phase % per_tick)
+        self.steps += 1
+
+        reward = 0.0 if self.reward is None else self.reward(c8)
+        terminated = halted(c8) or (self.terminated is not None
+                                    and bool(self.terminated(c8)))
+        truncated = self.max_steps is not None and self.steps >= self.max_steps
+        return self.observe(), reward, terminated, truncated, self.info()
+
+    def observe(self):
+        """
+        refill the observation from the display if it changed
+        """
+        gfx = self.chip8.gfx
+        dirty = gfx.take_dirty()
+
+        if (gfx.height, gfx.width) != self.observation.shape:
+            self.packed = np.zeros((gfx.height, gfx.width // 8), np.uint8)
+            self.observation = np.zeros((gfx.height, gfx.width), np.uint8)
+        elif not dirty:
+            return self.observation
+
+        self.packed.flat[:] = np.frombuffer(gfx.to_bytes(), np.uint8)
+        np.take(BITS, self.packed,
+                axis=0, out=self.observation.reshape(gfx.height, -1, 8))
+        return self.observation
+
+    def info(self):
+        c8 = self.chip8
+        return {'cycles': c8.cycles, 'steps': self.steps}
@@ -0,0 +1,464 @@
+"""
+SUPER-CHIP and XO-CHIP instruction sets
+
+mixins for the quirk profiles in quirks.py, on top of CHIP-8 they add:
+
+SUPER-CHIP  00CN 00FB 00FC  scroll down N, right 4, left 4
+            00FD 00FE 00FF  exit, 64x32 mode, 128x64 mode
+            DXY0            16x16 sprite
+            FX30            I = 8x10 font digit vX
+            FX75 FX85       store / read v0 - vX in the flag registers
+
+XO-CHIP     00DN            scroll up N
+            5XY2 5XY3       store / read vX - vY at I, I unchanged
+            F000 NNNN       I = NNNN, skips step over all four bytes
+            FN01            draw to bitplanes N
+            F002 FX3A       audio pattern from I, pitch = vX
+            64 KB of memory
+
+the display is one FrameBuffer per bitplane, gfx is the first, so
+scrolling shifts whole rows and a resolution change resizes them
+"""
+import struct
+
+from .chip8 import SNAPSHOT_HEADER, FrameBuffer, SnapshotError
+
+# opcode pattern handled by each handler added here
+PATTERNS = {
+    'scroll_down': '00CN',
+    'scroll_up': '00DN',
+    'scroll_right': '00FB',
+    'scroll_left': '00FC',
+    'exit_interpreter': '00FD',
+    'low_resolution': '00FE',
+    'high_resolution': '00FF',
+    'store_range': '5XY2',
+    'read_range': '5XY3',
+    'load_long_index': 'F000',
+    'select_planes': 'FN01',
+    'load_pattern': 'F002',
+    'load_big_hex_sprite': 'FX30',
+    'set_pitch': 'FX3A',
+    'store_flags': 'FX75',
+    'read_flags': 'FX85',
+}
+
+FONT = bytes([
+    0xF0, 0x90, 0x90, 0x90, 0xF0, 0x20, 0x60, 0x20, 0x20, 0x70,  # 0 1
+    0xF0, 0x10, 0xF0, 0x80, 0xF0, 0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 2 3
+    0x90, 0x90, 0xF0, 0x10, 0x10, 0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 4 5
+    0xF0, 0x80, 0xF0, 0x90, 0xF0, 0xF0, 0x10, 0x20, 0x40, 0x40,  # 6 7
+    0xF0, 0x90, 0xF0, 0x90, 0xF0, 0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 8 9
+    0xF0, 0x90, 0xF0, 0x90, 0x90, 0xE0, 0x90, 0xE0, 0x90, 0xE0,  # A B
+    0xF0, 0x80, 0x80, 0x80, 0xF0, 0xE0, 0x90, 0x90, 0x90, 0xE0,  # C D
+    0xF0, 0x80, 0xF0, 0x80, 0xF0, 0xF0, 0x80, 0xF0, 0x80, 0x80,  # E F
+])
+
+BIG_FONT_START = len(FONT)
+BIG_FONT = bytes([
+    0xFF, 0xFF, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF,  # 0
+    0x18, 0x78, 0x78, 0x18, 0x18, 0x18, 0x18, 0x18, 0xFF, 0xFF,  # 1
+    0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF,  # 2
+    0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 3
+    0xC3, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF, 0x03, 0x03, 0x03, 0x03,  # 4
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 5
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF,  # 6
+    0xFF, 0xFF, 0x03, 0x03, 0x06, 0x0C, 0x18, 0x18, 0x18, 0x18,  # 7
+    0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF,  # 8
+    0xFF, 0xFF, 0xC3, 0xC3, 0xFF, 0xFF, 0x03, 0x03, 0xFF, 0xFF,  # 9
+    0x7E, 0xFF, 0xC3, 0xC3, 0xC3, 0xFF, 0xFF, 0xC3, 0xC3, 0xC3,  # A
+    0xFC, 0xFC, 0xC3, 0xC3, 0xFC, 0xFC, 0xC3, 0xC3, 0xFC, 0xFC,  # B
+    0x3C, 0xFF, 0xC3, 0xC0, 0xC0, 0xC0, 0xC0, 0xC3, 0xFF, 0x3C,  # C
+    0xFC, 0xFE, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xC3, 0xFE, 0xFC,  # D
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF,  # E
+    0xFF, 0xFF, 0xC0, 0xC0, 0xFF, 0xFF, 0xC0, 0xC0, 0xC0, 0xC0,  # F
+])
+
+LORES = (64, 32)
+HIRES = (128, 64)
+
+# snapshot() appends these after the Chip8 blob
+SCHIP_STATE = struct.Struct('<?16s')  # hires, flag registers
+XO_STATE = struct.Struct('<B16sB')  # plane mask, audio pattern, pitch
+
+# instance attributes of the profile classes, which declare the slots
+SCHIP_SLOTS = ('hires', 'flags', 'planes', 'plane_mask')
+XO_SLOTS = SCHIP_SLOTS + ('pattern', 'pitch')
+
+
+class SuperChipInstructions:
+    """
+    SUPER-CHIP 1.1 instructions, sprites are clipped at the edges
+    """
+    __slots__ = ()
+
+    # FrameBuffer method drawing one plane of a sprite
+    blit = staticmethod(FrameBuffer.blit_clip)
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.memory[:len(FONT)] = FONT
+        self.memory[BIG_FONT_START:BIG_FONT_START + len(BIG_FONT)] = BIG_FONT
+        self.hires = False
+        self.flags = bytearray(16)
+        self.planes = [self.gfx]
+        self.plane_mask = 1
+
+    @classmethod
+    def decode_entry(cls, opcode):
+        if opcode & 0xFFF0 == 0x00C0:
+            return cls.scroll_down, (opcode & 0xF,)
+
+        match opcode:
+            case 0x00FB:
+                return cls.scroll_right, ()
+            case 0x00FC:
+                return cls.scroll_left, ()
+            case 0x00FD:
+                return cls.exit_interpreter, ()
+            case 0x00FE:
+                return cls.low_resolution, ()
+            case 0x00FF:
+                return cls.high_resolution, ()
+
+        if opcode & 0xF000 == 0xF000:
+            x = (opcode & 0x0F00) >> 8
+
+            match opcode & 0xFF:
+                case 0x30:
+                    return cls.load_big_hex_sprite, (x,)
+                case 0x75:
+                    return cls.store_flags, (x,)
+                case 0x85:
+                    return cls.read_flags, (x,)
+
+        return super().decode_entry(opcode)
+
+    def selected_planes(self):
+        mask = self.plane_mask
+        return [plane for i, plane in enumerate(self.planes) if mask >> i & 1]
+
+    def set_resolution(self, hires):
+        width, height = HIRES if hires else LORES
+        self.hires = hires
+
+        for plane in self.planes:
+            plane.resize(width, height)
+
+    def scroll(self, dx, dy):
+        for plane in self.selected_planes():
+            plane.scroll(dx, dy)
+
+        self.draw_flag = True
+
+    # 00E0
+    def clear_screen(self):
+        """
+        clear the selected planes
+        """
+        for plane in self.selected_planes():
+            plane.clear()
+
+    # 00CN
+    def scroll_down(self, n):
+        """
+        scroll the display down n rows
+        """
+        self.scroll(0, n)
+
+    # 00FB
+    def scroll_right(self):
+        """
+        scroll the display right 4 pixels
+        """
+        self.scroll(4, 0)
+
+    # 00FC
+    def scroll_left(self):
+        """
+        scroll the display left 4 pixels
+        """
+        self.scroll(-4, 0)
+
+    # 00FD
+    def exit_interpreter(self):
+        """
+        stop the program, pc stays on this instruction
+        """
+        self.pc -= 2
+
+    # 00FE
+    def low_resolution(self):
+        """
+        switch to 64x32 and clear the display
+        """
+        self.set_resolution(False)
+
+    # 00FF
+    def high_resolution(self):
+        """
+        switch to 128x64 and clear the display
+        """
+        self.set_resolution(True)
+
+    # DXYN DXY0
+    def draw(self, x, y, n):
+        """
+        draw an 8xN sprite, or a 16x16 one when N is 0, at vX, vY on
+        every selected plane, the planes take consecutive sprite data
+        set vF = collision
+        """
+        regs = self.regs
+        memory = self.memory
+        gfx = self.gfx
+        x_pos = regs[x] % gfx.width
+        y_pos = regs[y] % gfx.height
+        size = 32 if n == 0 else n
+        start = self.index
+        collision = 0
+
+        for plane in self.selected_planes():
+            if start + size > len(memory):
+                raise IndexError('sprite data out of range')
+
+            data = memory[start:start + size]
+
+            if n == 0:
+                collision |= self.blit(plane, x_pos, y_pos, [
+                    data[i] << 8 | data[i + 1] for i in range(0, 32, 2)
+                ], 16)
+            else:
+                collision |= self.blit(plane, x_pos, y_pos, data)
+
+            start += size
+
+        regs[0xF] = collision
+        self.draw_flag = True
+
+    # FX29
+    def load_hex_sprite(self, x):
+        """
+        set I = location of sprite for digit vX
+        """
+        self.index = 5 * (self.regs[x] & 0xF)
+
+    # FX30
+    def load_big_hex_sprite(self, x):
+        """
+        set I = location of the 8x10 sprite for digit vX
+        """
+        self.index = BIG_FONT_START + 10 * (self.regs[x] & 0xF)
+
+    # FX75
+    def store_flags(self, x):
+        """
+        store v0 through vX in the flag registers
+        """
+        self.flags[:x + 1] = self.regs[:x + 1]
+
+    # FX85
+    def read_flags(self, x):
+        """
+        read v0 through vX from the flag registers
+        """
+        self.regs[:x + 1] = self.flags[:x + 1]
+
+    def extra_state(self):
+        return SCHIP_STATE.pack(self.hires, bytes(self.flags))
+
+    def load_extra_state(self, view):
+        hires, flags = SCHIP_STATE.unpack_from(view)
+        self.hires = hires
+        self.flags[:] = flags
+
+    def extra_size(self, width, height):
+        return SCHIP_STATE.size
+
+    def snapshot(self):
+        """
+        the Chip8 snapshot followed by the extended state
+        """
+        return super().snapshot() + self.extra_state()
+
+    def restore(self, blob):
+        view = memoryview(blob)
+
+        try:
+            header = SNAPSHOT_HEADER.unpack_from(view)
+        except struct.error:
+            raise SnapshotError('truncated header') from None
+
+        size = self.extra_size(header[2], header[3])
+
+        if len(view) < SNAPSHOT_HEADER.size + size:
+            raise SnapshotError('size mismatch')
+
+        if header[2:4] in (LORES, HIRES):
+            self.set_resolution(header[2:4] == HIRES)
+
+        super().restore(view[:len(view) - size])
+        self.load_extra_state(view[len(view) - size:])
+
+
+class XoChipInstructions(SuperChipInstructions):
+    """
+    XO-CHIP instructions, sprites wrap around the edges
+    """
+    __slots__ = ()
+
+    blit = staticmethod(FrameBuffer.blit_around)
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        memory = bytearray(0x10000)
+        memory[:len(self.memory)] = self.memory
+        self.memory = memory
+        self.planes.append(FrameBuffer(*LORES))
+        self.pattern = bytes(16)
+        self.pitch = 64
+
+    @classmethod
+    def decode_entry(cls, opcode):
+        x = (opcode & 0x0F00) >> 8
+        y = (opcode & 0x00F0) >> 4
+
+        if opcode == 0xF000:
+            return cls.load_long_index, ()
+
+        if opcode == 0xF002:
+            return cls.load_pattern, ()
+
+        if opcode & 0xFFF0 == 0x00D0:
+            return cls.scroll_up, (opcode & 0xF,)
+
+        match opcode & 0xF00F:
+            case 0x5002:
+                return cls.store_range, (x, y)
+            case 0x5003:
+                return cls.read_range, (x, y)
+
+        match opcode & 0xF0FF:
+            case 0xF001:
+                return cls.select_planes, (x,)
+            case 0xF03A:
+                return cls.set_pitch, (x,)
+
+        return super().decode_entry(opcode)
+
+    def skip(self):
+        """
+        step over the next instruction, all four bytes of F000 NNNN
+        """
+        pc = self.pc
+
+        if self.memory[pc] == 0xF0 and self.memory[pc + 1] == 0x00:
+            self.pc = pc + 4
+        else:
+            self.pc = pc + 2
+
+    # 3XNN
+    def skip_equal(self, x, nn):
+        if self.regs[x] == nn:
+            self.skip()
+
+    # 4XNN
+    def skip_not_equal(self, x, nn):
+        if self.regs[x] != nn:
+            self.skip()
+
+    # 5XY0
+    def skip_equal_reg(self, x, y):
+        if self.regs[x] == self.regs[y]:
+            self.skip()
+
+    # 9XY0
+    def skip_reg_not_equal(self, x, y):
+        if self.regs[x] != self.regs[y]:
+            self.skip()
+
+    # EX9E
+    def skip_key_pressed(self, x):
+        if self.keys[self.regs[x]] == 1:
+            self.skip()
+
+    # EXA1
+    def skip_key_not_pressed(self, x):
+        if self.keys[self.regs[x]] == 0:
+            self.skip()
+
+    # 00DN
+    def scroll_up(self, n):
+        """
+        scroll the display up n rows
+        """
+        self.scroll(0, -n)
+
+    # 5XY2
+    def store_range(self, x, y):
+        """
+        store vX through vY in memory starting at I, in either order
+        """
+        step = 1 if x <= y else -1
+        count = abs(y - x) + 1
+
+        for i in range(count):
+            self.memory[self.index + i] = self.regs[x + i * step]
+
+        if self.write_listeners:
+            self.notify_write(self.index, count)
+
+    # 5XY3
+    def read_range(self, x, y):
+        """
+        read vX through vY from memory starting at I, in either order
+        """
+        step = 1 if x <= y else -1
+        count = abs(y - x) + 1
+
+        for i in range(count):
+            self.regs[x + i * step] = self.memory[self.index + i]
+
+    # F000 NNNN
+    def load_long_index(self):
+        """
+        set I to the 16-bit address in the next two bytes
+        """
+        pc = self.pc
+        self.index = self.memory[pc] << 8 | self.memory[pc + 1]
+        self.pc = pc + 2
+
+    # FN01
+    def select_planes(self, n):
+        """
+        draw, clear and scroll only the planes in bitmask n
+        """
+        self.plane_mask = n & 0x3
+
+    # F002
+    def load_pattern(self):
+        """
+        load the 16 byte audio pattern at I
+        """
+        self.pattern = bytes(self.memory[self.index:self.index + 16])
+
+    # FX3A
+    def set_pitch(self, x):
+        """
+        set the audio pattern playback pitch = vX
+        """
+        self.pitch = self.regs[x]
+
+    def extra_state(self):
+        return (super().extra_state()
+                + XO_STATE.pack(self.plane_mask, self.pattern, self.pitch)
+                + self.planes[1].to_bytes())
+
+    def load_extra_state(self, view):
+        super().load_extra_state(view)
+        view = view[SCHIP_STATE.size:]
+        self.plane_mask, pattern, self.pitch = XO_STATE.unpack_from(view)
+        self.pattern = bytes(pattern)
+        self.planes[1].load_bytes(view[XO_STATE.size:])
+
+    def extra_size(self, width, height):
+        return SCHIP_STATE.size + XO_STATE.size + width * height // 8
@@ -0,0 +1,214 @@
+"""
+headless ROM farm
+
+run every combination of ROM, cycle budget and key script across a
+process pool and print one JSON result per line:
+
+    python -m src.farm 1-chip8-logo.ch8 2-ibm-logo.ch8 --cycles 1000 5000
+
+--save-golden writes the final frame hash of every job to a JSON file,
+--golden compares later runs against it and fails on any difference
+
+a key script holds one event per line, the cycle to fire it at,
+press or release and the key in hex, '#' starts a comment:
+
+    120 press 5
+    180 release 5
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .chip8 import DecodeError, RomError
+from .movie import play
+from .quirks import PROFILES, machine
+
+
+def parse_key_script(text):
+    """
+    return the (cycle, key, pressed) events of a key script sorted by cycle
+    """
+    events = []
+
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+
+        if not line:
+            continue
+
+        try:
+            cycle, action, key = line.split()
+            event = (int(cycle), int(key, 16), action == 'press')
+        except ValueError:
+            raise KeyScriptError(f'line {number}: {line}') from None
+
+        if action not in ('press', 'release') or not 0 <= event[1] < 16:
+            raise KeyScriptError(f'line {number}: {line}')
+
+        events.append(event)
+
+    return sorted(events, key=lambda event: event[0])
+
+
+def frame_digest(c8):
+    return f'{c8.gfx.digest():016x}'
+
+
+def run_job(job):
+    """
+    run one job dict with rom, cycles, and optionally events, seed, cpu_hz,
+    profile and skip_idle, return a JSON-ready result dict
+
+    cps counts the instructions really executed, skipped ones are left
+    out, so it stays a measure of speed with skip_idle set
+    """
+    c8 = machine(job.get('profile', 'chip8'), seed=job.get('seed', 0))
+    c8.cpu_hz = job.get('cpu_hz', c8.cpu_hz)
+    budget = job['cycles']
+    error = None
+    start = time.perf_counter()
+
+    # a failing job reports its error, the other jobs in the pool go on
+    try:
+        c8.load_rom(job['rom'])
+        play(c8, job.get('events', ()), budget, job.get('skip_idle', False))
+    except (DecodeError, IndexError, RomError, OSError) as e:
+        error = str(e)
+
+    elapsed = time.perf_counter() - start
+    executed = c8.cycles - c8.skipped
+
+    return {
+        'rom': job['rom'],
+        'keys': job.get('keys'),
+        'profile': job.get('profile', 'chip8'),
+        'cycles': c8.cycles,
+        'skipped': c8.skipped,
+        'frame': frame_digest(c8),
+        'regs': bytes(c8.regs).hex(),
+        'pc': c8.pc,
+        'index': c8.index,
+        'sp': c8.sp,
+        'cps': round(executed / elapsed) if elapsed else None,
+        'error': error,
+    }
+
+
+def run_farm(jobs, workers=None):
+    """
+    run jobs across a process pool, results come back in job order
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_job, jobs, chunksize=4))
+
+
+def golden_key(result):
+    key = f"{result['rom']}:{result['cycles']}:{result['keys'] or ''}"
+
+    if result.get('profile', 'chip8') != 'chip8':
+        key += f":{result['profile']}"
+
+    return key
+
+
+def check_golden(results, golden):
+    """
+    mark every result with golden True, False or None when there is no
+    stored frame hash for it, return the results that do not match
+    """
+    mismatches = []
+
+    for result in results:
+        expected = golden.get(golden_key(result))
+
+        if expected is None:
+            result['golden'] = None
+        else:
+            result['golden'] = result['frame'] == expected
+
+            if not result['golden']:
+                mismatches.append(result)
+
+    return mismatches
+
+
+def build_jobs(roms, budgets, scripts=(), cpu_hz=600, profile='chip8',
+               skip_idle=False):
+    scripts = list(scripts) or [None]
+    events = {}
+
+    for script in scripts:
+        if script is not None:
+            with open(script) as f:
+                events[script] = parse_key_script(f.read())
+
+    return [
+        {
+            'rom': rom,
+            'cycles': cycles,
+            'keys': script,
+            'events': events.get(script, []),
+            'cpu_hz': cpu_hz,
+            'profile': profile,
+            'skip_idle': skip_idle,
+        }
+        for rom in roms
+        for cycles in budgets
+        for script in scripts
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run ROMs headless')
+    parser.add_argument('roms', nargs='+', help='.ch8 files')
+    parser.add_argument('--cycles', nargs='+', type=int, default=[10000],
+                        help='cycle budgets')
+    parser.add_argument('--keys', nargs='*', default=[],
+                        help='key scripts')
+    parser.add_argument('--cpu-hz', type=int, default=600,
+                        help='instructions per second of emulated time')
+    parser.add_argument('--profile', choices=PROFILES, default='chip8',
+                        help='quirk profile')
+    parser.add_argument('--skip-idle', action='store_true',
+                        help='skip over idle loops, cps leaves them out')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes, defaults to the number of cores')
+    parser.add_argument('--golden', help='frame hashes to compare against')
+    parser.add_argument('--save-golden', help='write the frame hashes')
+    args = parser.parse_args(argv)
+
+    jobs = build_jobs(args.roms, args.cycles, args.keys, args.cpu_hz,
+                      args.profile, args.skip_idle)
+    results = run_farm(jobs, args.workers)
+    failed = any(result['error'] is not None for result in results)
+
+    if args.golden:
+        with open(args.golden) as f:
+            failed = bool(check_golden(results, json.load(f))) or failed
+
+    for result in results:
+        print(json.dumps(result))
+
+    if args.save_golden:
+        with open(args.save_golden, 'w') as f:
+            json.dump({golden_key(result): result['frame']
+                       for result in results}, f, indent=2)
+
+    return 1 if failed else 0
+
+
+class KeyScriptError(Exception):
+    """
+    use when a key script line can not be parsed
+    """
+    def __init__(self, message):
+        self.message = f'key script could not be parsed: {message}'
+
+    def __str__(self):
+        return self.message
+
+
+if __name__ == '__main__':
+    sys.exit(main())
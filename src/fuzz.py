@@ -0,0 +1,256 @@
+"""
+differential fuzzing of the execution engines
+
+every case is a random program of valid opcodes drawn from the plain
+CHIP-8 instruction set, run on the reference emulate_cycle loop and on
+the faster engines, the machine state is compared after every `every`
+instructions:
+
+    python -m src.fuzz --cases 100000 --engines run blocks batch
+
+run      Chip8.run with cpu_hz = timer_hz, so the timers tick once per
+         instruction as in emulate_cycle, idle loops are skipped
+blocks   BlockEngine
+batch    Chip8Batch, one lane per case, needs numpy
+
+a mismatch is shrunk to a program from which no instruction can be
+removed without the engines agreeing, and printed as one JSON line
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .blocks import BlockEngine
+from .chip8 import PATTERNS, Chip8, DecodeError
+
+try:
+    from .batch import Chip8Batch
+except ImportError:  # numpy is optional
+    Chip8Batch = None
+
+ENGINES = ('run', 'blocks', 'batch')
+
+FAULT = 'fault'  # checkpoint of an engine that stopped on a bad program
+
+
+def random_program(rng, length):
+    """
+    return length random opcodes, jumps and calls land inside the program,
+    I anywhere up to just past it so FX33 / FX55 may rewrite it
+    """
+    patterns = list(PATTERNS.values())
+    end = 0x200 + 2 * length
+    opcodes = []
+
+    for _ in range(length):
+        pattern = rng.choice(patterns)
+
+        if pattern[1:] == 'NNN':
+            if pattern[0] == 'A':
+                nnn = rng.randrange(end + 16)
+            else:
+                nnn = rng.randrange(0x200, end, 2)
+
+            opcodes.append(int(pattern[0], 16) << 12 | nnn)
+            continue
+
+        digits = re.sub('[XYN]', lambda _: f'{rng.randrange(16):X}', pattern)
+        opcodes.append(int(digits, 16))
+
+    return opcodes
+
+
+def new_machine(seed, opcodes):
+    c8 = Chip8(seed=seed)
+    c8.cpu_hz = c8.timer_hz
+
+    for i, opcode in enumerate(opcodes):
+        c8.memory[0x200 + 2 * i] = opcode >> 8
+        c8.memory[0x201 + 2 * i] = opcode & 0xFF
+
+    c8.keys[:] = bytes(random.Random(seed).randrange(2) for _ in range(16))
+    return c8
+
+
+def reference(seed, opcodes, cycles, every):
+    """
+    return the snapshots of the emulate_cycle loop every `every` cycles,
+    ending with FAULT if the program stopped with an error
+    """
+    c8 = new_machine(seed, opcodes)
+    states = []
+
+    try:
+        for cycle in range(1, cycles // every * every + 1):
+            c8.emulate_cycle()
+
+            if cycle % every == 0:
+                states.append(c8.snapshot())
+    except (DecodeError, IndexError):
+        states.append(FAULT)
+
+    return states
+
+
+def checkpoints(engine, seed, opcodes, cycles, every):
+    """
+    return the snapshots of engine, as reference() does
+    """
+    if engine == 'batch':
+        return batch_checkpoints([(seed, opcodes)], cycles, every)[0]
+
+    c8 = new_machine(seed, opcodes)
+    step = c8.run if engine == 'run' else BlockEngine(c8).run
+    states = []
+
+    try:
+        for _ in range(cycles // every):
+            step(every)
+            states.append(c8.snapshot())
+    except (DecodeError, IndexError):
+        states.append(FAULT)
+
+    return states
+
+
+def batch_checkpoints(cases, cycles, every):
+    """
+    return the snapshots of every (seed, opcodes) case run as one batch
+    """
+    machines = [new_machine(seed, opcodes) for seed, opcodes in cases]
+    batch = Chip8Batch.from_machines(machines)
+    results = [[] for _ in cases]
+
+    for _ in range(cycles // every):
+        batch.run(every)
+
+        for lane, states in enumerate(results):
+            if states and states[-1] is FAULT:
+                continue
+
+            if batch.faulted[lane]:
+                states.append(FAULT)
+            else:
+                states.append(batch.machine(lane).snapshot())
+
+    return results
+
+
+def differs(expected, observed):
+    """
+    True when two checkpoint lists disagree, a fault replaces the state
+    of its window, which the faulting instruction may leave half done
+    """
+    return len(expected) != len(observed) or any(
+        a != b for a, b in zip(expected, observed))
+
+
+def mismatch(engine, seed, opcodes, cycles, every):
+    expected = reference(seed, opcodes, cycles, every)
+    observed = checkpoints(engine, seed, opcodes, cycles, every)
+    return differs(expected, observed)
+
+
+def shrink(engine, seed, opcodes, cycles, every):
+    """
+    remove runs of instructions, halving the run length down to one,
+    for as long as the program still makes engine disagree
+    """
+    size = len(opcodes) // 2
+
+    while size:
+        i = 0
+
+        while i < len(opcodes):
+            candidate = opcodes[:i] + opcodes[i + size:]
+
+            if candidate and mismatch(engine, seed, candidate, cycles, every):
+                opcodes = candidate
+            else:
+                i += size
+
+        size //= 2
+
+    return opcodes
+
+
+def check_cases(seeds, length, cycles, every, engines):
+    """
+    fuzz one case per seed on every engine, return the mismatches
+    """
+    cases = [(seed, random_program(random.Random(seed), length))
+             for seed in seeds]
+    expected = [reference(seed, opcodes, cycles, every)
+                for seed, opcodes in cases]
+    found = []
+
+    for engine in engines:
+        if engine == 'batch':
+            observed = batch_checkpoints(cases, cycles, every)
+        else:
+            observed = [checkpoints(engine, seed, opcodes, cycles, every)
+                        for seed, opcodes in cases]
+
+        for (seed, opcodes), a, b in zip(cases, expected, observed):
+            if differs(a, b):
+                program = shrink(engine, seed, opcodes, cycles, every)
+                found.append({
+                    'engine': engine,
+                    'seed': seed,
+                    'program': ' '.join(f'{op:04X}' for op in program),
+                })
+
+    return found
+
+
+def fuzz(cases, length=32, cycles=256, every=16, engines=('run', 'blocks'),
+         seed=0, workers=None, chunk=64):
+    """
+    fuzz cases programs across a process pool, return the mismatches
+    """
+    starts = range(seed, seed + cases, chunk)
+    args = [range(start, min(start + chunk, seed + cases)) for start in starts]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(check_cases, seeds, length, cycles, every,
+                               engines) for seeds in args]
+        return [found for future in futures for found in future.result()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='fuzz the engines')
+    parser.add_argument('--cases', type=int, default=10000,
+                        help='random programs to run')
+    parser.add_argument('--length', type=int, default=32,
+                        help='instructions per program')
+    parser.add_argument('--cycles', type=int, default=256,
+                        help='instructions to run each program for')
+    parser.add_argument('--every', type=int, default=16,
+                        help='instructions between state comparisons')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES,
+                        default=[engine for engine in ENGINES
+                                 if engine != 'batch' or Chip8Batch],
+                        help='engines to compare')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first case')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes, defaults to the number of cores')
+    args = parser.parse_args(argv)
+
+    if 'batch' in args.engines and Chip8Batch is None:
+        parser.error('the batch engine needs numpy')
+
+    found = fuzz(args.cases, args.length, args.cycles, args.every,
+                 args.engines, args.seed, args.workers)
+
+    for mismatch in found:
+        print(json.dumps(mismatch))
+
+    return 1 if found else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,151 @@
-from chip8 import Chip8
+"""
+curses front end
+
+    python -m src.game 6-keypad.ch8
+    python -m src.game 6-keypad.ch8 --record keypad.c8m
+    python -m src.game 3-corax+.ch8 4-flags.ch8 --publish chip8-a chip8-b
+
+with --record the key events are logged into a movie, saved on exit,
+which movie.Movie replays; with --publish the roms run headless, each
+one publishing its display to a shared memory block, watch them with
+python -m src.shm
+"""
+import argparse
+import asyncio
 import curses
+import random
+import sys
 from curses import wrapper
 from curses.textpad import rectangle
-from time import sleep
+from time import monotonic
+
+from .chip8 import Chip8, DecodeError, RomError
+from .movie import Recorder
+from .shm import FramePublisher
+
+# keyboard layout of the 4x4 keypad
+KEYPAD = [
+    ['1', '2', '3', '4'],
+    ['q', 'w', 'e', 'r'],
+    ['a', 's', 'd', 'f'],
+    ['z', 'x', 'c', 'v'],
+]
+
+# keyboard key -> chip8 key
+KEYS = {
+    '1': 0x1, '2': 0x2, '3': 0x3, '4': 0xC,
+    'q': 0x4, 'w': 0x5, 'e': 0x6, 'r': 0xD,
+    'a': 0x7, 's': 0x8, 'd': 0x9, 'f': 0xE,
+    'z': 0xA, 'x': 0x0, 'c': 0xB, 'v': 0xF,
+}
+
+
+def draw_curses(stdscr, color, chip8, full=False):
+    """
+    redraw the rows changed since the last call, or all of them,
+    return False when there was nothing to draw
+    """
+    dirty = chip8.gfx.take_dirty()
+
+    if full:
+        dirty = (1 << chip8.gfx.height) - 1
 
+    if not dirty:
+        return False
 
-def draw_curses(stdscr, color, chip8):
-    for y in range(0, 32):
-        for x in range(0, 64):
-            if chip8.gfx[x + y * 64]:
-                stdscr.addstr(7 + y, 1 + x, '█', color)
+    for y in range(0, chip8.gfx.height):
+        if dirty >> y & 1:
+            stdscr.addstr(7 + y, 1, chip8.gfx.render_row(y), color)
+
+    return True
+
+
+def draw_keypad(stdscr, color, key):
+    for row, names in enumerate(KEYPAD):
+        for col, name in enumerate(names):
+            if name == key:
+                attr = curses.A_BOLD
             else:
-                stdscr.addstr(7 + y, 1 + x, ' ', color)
+                attr = curses.A_DIM
 
+            stdscr.addstr(1 + row, 1 + col * 2, f'{KEYS[name]:X}',
+                          color | attr)
 
-def main(stdscr):
-    cycles_per_frame = 10
-    c8 = Chip8()
-    # c8.load_rom('1-chip8-logo.ch8')
-    # c8.load_rom('2-ibm-logo.ch8')
-    # c8.load_rom('3-corax+.ch8')
-    # c8.load_rom('4-flags.ch8')
-    c8.load_rom('6-keypad.ch8')
 
-    curses.curs_set(0)
+class Host:
+    """
+    run one machine on the event loop, the cpu is a task paced by the
+    wall clock, so emulated time keeps up however slow rendering is,
+    several hosts can share one loop
 
-    curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
-    GREEN_AND_BLACK = curses.color_pair(1)
+    the timers tick every cpu_hz / timer_hz instructions inside
+    Chip8.run, so the run depends only on the instructions executed and
+    the key events, not on how the clock happened to wake up
 
-    stdscr.nodelay(True)
+    a task that falls more than max_lag seconds behind drops the excess
+    instead of trying to catch up all at once
+    """
+    def __init__(self, chip8, cpu_hz=600, timer_hz=60, max_lag=0.25):
+        self.chip8 = chip8
+        self.cpu_hz = cpu_hz
+        self.timer_hz = timer_hz
+        self.max_lag = max_lag
+        chip8.cpu_hz = cpu_hz
+        chip8.timer_hz = timer_hz
+
+    async def clock(self, hz, step):
+        """
+        call step(count) with the number of periods of hz owed since start
+        """
+        start = monotonic()
+        done = 0
+        max_owed = max(1, int(self.max_lag * hz))
 
+        while True:
+            owed = int((monotonic() - start) * hz) - done
+
+            if owed > max_owed:
+                done += owed - max_owed
+                owed = max_owed
+
+            if owed > 0:
+                step(owed)
+                done += owed
+
+            await asyncio.sleep(1 / self.timer_hz / 4)
+
+    async def cpu(self):
+        await self.clock(self.cpu_hz, self.chip8.run)
+
+    def tasks(self):
+        return [self.cpu()]
+
+
+async def render(stdscr, color, chip8, hz=60):
+    """
+    repaint changed rows at most hz times a second, frames that come late
+    are dropped rather than queued
+    """
+    while True:
+        if draw_curses(stdscr, color, chip8):
+            stdscr.refresh()
+
+        await asyncio.sleep(1 / hz)
+
+
+async def read_keys(stdscr, color, chip8, keypad, interval=0.005):
+    """
+    press the key typed last and release the others through keypad,
+    the machine or a movie.Recorder of it
+    """
     y = 32 + 1
     x = 64 + 1
 
     while True:
-        for _ in range(cycles_per_frame):
-            c8.emulate_cycle()
-
         try:
             key = stdscr.getkey()
         except Exception:
             key = None
-            # c8.keys = [0] * 16
 
         if key:
             stdscr.clear()
@@ -49,121 +153,128 @@ def main(stdscr):
             rectangle(stdscr, 0, 0, 5, 8)
             rectangle(stdscr, 6, 0, y + 6, x)
 
-            if key == '1':
-                c8.keys[0x1] = 1
-                stdscr.addstr(1, 1, '1', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x1] = 0
-                stdscr.addstr(1, 1, '1', GREEN_AND_BLACK | curses.A_DIM)
+            for name, value in KEYS.items():
+                if name == key:
+                    keypad.press_key(value)
+                elif chip8.keys[value]:
+                    keypad.release_key(value)
 
-            if key == '2':
-                c8.keys[0x2] = 1
-                stdscr.addstr(1, 3, '2', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x2] = 0
-                stdscr.addstr(1, 3, '2', GREEN_AND_BLACK | curses.A_DIM)
+            draw_keypad(stdscr, color, key)
 
-            if key == '3':
-                c8.keys[0x3] = 1
-                stdscr.addstr(1, 5, '3', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x3] = 0
-                stdscr.addstr(1, 5, '3', GREEN_AND_BLACK | curses.A_DIM)
+            # stdscr.clear() above wiped the display, so repaint all of it
+            draw_curses(stdscr, color, chip8, full=True)
+            stdscr.refresh()
 
-            if key == '4':
-                c8.keys[0xC] = 1
-                stdscr.addstr(1, 7, 'C', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xC] = 0
-                stdscr.addstr(1, 7, 'C', GREEN_AND_BLACK | curses.A_DIM)
+        await asyncio.sleep(interval)
 
-            if key == 'q':
-                c8.keys[0x4] = 1
-                stdscr.addstr(2, 1, '4', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x4] = 0
-                stdscr.addstr(2, 1, '4', GREEN_AND_BLACK | curses.A_DIM)
 
-            if key == 'w':
-                c8.keys[0x5] = 1
-                stdscr.addstr(2, 3, '5', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x5] = 0
-                stdscr.addstr(2, 3, '5', GREEN_AND_BLACK | curses.A_DIM)
+async def publish(publisher, hz=60):
+    """
+    copy changed frames to shared memory at most hz times a second,
+    for viewers in other processes, see shm.py
+    """
+    while True:
+        publisher.publish()
+        await asyncio.sleep(1 / hz)
 
-            if key == 'e':
-                c8.keys[0x6] = 1
-                stdscr.addstr(2, 5, '6', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x6] = 0
-                stdscr.addstr(2, 5, '6', GREEN_AND_BLACK | curses.A_DIM)
 
-            if key == 'r':
-                c8.keys[0xD] = 1
-                stdscr.addstr(2, 7, 'D', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xD] = 0
-                stdscr.addstr(2, 7, 'D', GREEN_AND_BLACK | curses.A_DIM)
+async def serve(machines, publishers):
+    """
+    run machines headless, each publishing its display to a viewer
+    """
+    tasks = []
 
-            if key == 'a':
-                c8.keys[0x7] = 1
-                stdscr.addstr(3, 1, '7', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x7] = 0
-                stdscr.addstr(3, 1, '7', GREEN_AND_BLACK | curses.A_DIM)
+    for chip8, publisher in zip(machines, publishers):
+        tasks.extend(Host(chip8).tasks())
+        tasks.append(publish(publisher))
 
-            if key == 's':
-                c8.keys[0x8] = 1
-                stdscr.addstr(3, 3, '8', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x8] = 0
-                stdscr.addstr(3, 3, '8', GREEN_AND_BLACK | curses.A_DIM)
+    await asyncio.gather(*tasks)
 
-            if key == 'd':
-                c8.keys[0x9] = 1
-                stdscr.addstr(3, 5, '9', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x9] = 0
-                stdscr.addstr(3, 5, '9', GREEN_AND_BLACK | curses.A_DIM)
 
-            if key == 'f':
-                c8.keys[0xE] = 1
-                stdscr.addstr(3, 7, 'E', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xE] = 0
-                stdscr.addstr(3, 7, 'E', GREEN_AND_BLACK | curses.A_DIM)
+async def play(stdscr, color, chip8, keypad):
+    host = Host(chip8, cpu_hz=chip8.cpu_hz)
+    await asyncio.gather(*host.tasks(),
+                         render(stdscr, color, chip8),
+                         read_keys(stdscr, color, chip8, keypad))
 
-            if key == 'z':
-                c8.keys[0xA] = 1
-                stdscr.addstr(4, 1, 'A', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xA] = 0
-                stdscr.addstr(4, 1, 'A', GREEN_AND_BLACK | curses.A_DIM)
 
-            if key == 'x':
-                c8.keys[0x0] = 1
-                stdscr.addstr(4, 3, '0', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0x0] = 0
-                stdscr.addstr(4, 3, '0', GREEN_AND_BLACK | curses.A_DIM)
+def run_curses(stdscr, c8, keypad):
+    curses.curs_set(0)
 
-            if key == 'c':
-                c8.keys[0xB] = 1
-                stdscr.addstr(4, 5, 'B', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xB] = 0
-                stdscr.addstr(4, 5, 'B', GREEN_AND_BLACK | curses.A_DIM)
+    curses.init_pair(1, curses.COLOR_GREEN, curses.COLOR_BLACK)
+    GREEN_AND_BLACK = curses.color_pair(1)
 
-            if key == 'v':
-                c8.keys[0xF] = 1
-                stdscr.addstr(4, 7, 'F', GREEN_AND_BLACK | curses.A_BOLD)
-            else:
-                c8.keys[0xF] = 0
-                stdscr.addstr(4, 7, 'F', GREEN_AND_BLACK | curses.A_DIM)
+    stdscr.nodelay(True)
+
+    asyncio.run(play(stdscr, GREEN_AND_BLACK, c8, keypad))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='play CHIP-8 roms')
+    parser.add_argument('roms', nargs='*', default=['6-keypad.ch8'],
+                        help='.ch8 files')
+    parser.add_argument('--publish', nargs='+', metavar='NAME',
+                        help='run headless, publishing the display of '
+                             'each rom to the shared memory block NAME')
+    parser.add_argument('--record', metavar='PATH',
+                        help='save the key events as a movie on exit')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the CXNN random numbers')
+    args = parser.parse_args(argv)
+
+    if args.publish and args.record:
+        parser.error('--record needs a keyboard, not --publish')
+
+    if args.publish and len(args.publish) != len(args.roms):
+        parser.error('--publish needs one name per rom')
+
+    if not args.publish and len(args.roms) != 1:
+        parser.error('play one rom at a time, or --publish them')
+
+    machines = []
+    recorder = None
+
+    try:
+        if args.record:
+            # a movie needs a seed to replay from
+            seed = random.getrandbits(64) if args.seed is None else args.seed
+            recorder = Recorder(args.roms[0], seed)
+            machines.append(recorder.chip8)
+        else:
+            for rom in args.roms:
+                c8 = Chip8(seed=args.seed)
+                c8.load_rom(rom)
+                machines.append(c8)
+    except (OSError, RomError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    try:
+        if not args.publish:
+            try:
+                wrapper(run_curses, machines[0], recorder or machines[0])
+            finally:
+                if recorder is not None:
+                    recorder.stop().save(args.record)
+
+            return 0
+
+        publishers = []
+
+        try:
+            for c8, name in zip(machines, args.publish):
+                publishers.append(FramePublisher(c8, name))
 
-        draw_curses(stdscr, GREEN_AND_BLACK, c8)
-        stdscr.refresh()
-        sleep(0.0016)
+            asyncio.run(serve(machines, publishers))
+        finally:
+            for publisher in publishers:
+                publisher.close()
+    except KeyboardInterrupt:
+        return 0
+    except (DecodeError, FileExistsError) as e:
+        print(e, file=sys.stderr)
+        return 1
 
 
-wrapper(main)
+if __name__ == '__main__':
+    sys.exit(main())
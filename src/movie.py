@@ -0,0 +1,143 @@
+"""
+deterministic input movies
+
+a movie is the RNG seed, the instruction rate and every key press and
+release stamped with the cycle it happened at, replaying it against
+the same ROM reproduces the run exactly, headless and at full speed
+"""
+import hashlib
+import struct
+
+from .chip8 import Chip8
+
+# magic, seed, cpu_hz, length in cycles, event count, final state digest
+MOVIE_HEADER = struct.Struct('<4sQIQI16s')
+MOVIE_EVENT = struct.Struct('<QBB')  # cycle, key, pressed
+MOVIE_MAGIC = b'C8M1'
+
+
+def state_digest(c8):
+    return hashlib.blake2b(c8.snapshot(), digest_size=16).digest()
+
+
+def play(c8, events, length, skip_idle=True):
+    """
+    run c8 up to cycle length, firing (cycle, key, pressed) events on the way
+    """
+    for cycle, key, pressed in events:
+        if cycle >= length:
+            break
+
+        c8.run(cycle - c8.cycles, skip_idle=skip_idle)
+
+        if pressed:
+            c8.press_key(key)
+        else:
+            c8.release_key(key)
+
+    c8.run(length - c8.cycles, skip_idle=skip_idle)
+
+
+class Movie:
+    def __init__(self, seed=0, cpu_hz=600, events=None, length=0,
+                 digest=bytes(16)):
+        self.seed = seed
+        self.cpu_hz = cpu_hz
+        self.events = events if events is not None else []
+        self.length = length
+        self.digest = digest  # state digest at length, zeros if unknown
+
+    def to_bytes(self):
+        header = MOVIE_HEADER.pack(MOVIE_MAGIC, self.seed, self.cpu_hz,
+                                   self.length, len(self.events), self.digest)
+        events = b''.join(MOVIE_EVENT.pack(*event) for event in self.events)
+        return header + events
+
+    @classmethod
+    def from_bytes(cls, data):
+        try:
+            magic, seed, cpu_hz, length, count, digest = (
+                MOVIE_HEADER.unpack_from(data))
+        except struct.error:
+            raise MovieError('truncated header') from None
+
+        if magic != MOVIE_MAGIC:
+            raise MovieError('bad magic')
+
+        if len(data) != MOVIE_HEADER.size + count * MOVIE_EVENT.size:
+            raise MovieError('size mismatch')
+
+        events = [
+            (cycle, key, bool(pressed)) for cycle, key, pressed
+            in MOVIE_EVENT.iter_unpack(data[MOVIE_HEADER.size:])
+        ]
+        return cls(seed, cpu_hz, events, length, digest)
+
+    def save(self, path: str):
+        with open(path, 'wb') as movie:
+            movie.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, 'rb') as movie:
+            return cls.from_bytes(movie.read())
+
+    def machine(self, rom):
+        """
+        return a fresh machine set up the way the movie was recorded
+        """
+        c8 = Chip8(seed=self.seed)
+        c8.cpu_hz = self.cpu_hz
+        c8.load_rom(rom)
+        return c8
+
+    def replay(self, rom):
+        """
+        replay the movie headless, return the machine at its last cycle
+        """
+        c8 = self.machine(rom)
+        play(c8, self.events, self.length)
+        return c8
+
+    def verify(self, rom):
+        """
+        return True when a replay ends in the recorded state
+        """
+        return state_digest(self.replay(rom)) == self.digest
+
+
+class Recorder:
+    """
+    drive a machine while logging key events into a movie,
+    call press_key / release_key here instead of on the machine
+    """
+    def __init__(self, rom, seed=0, cpu_hz=600):
+        self.movie = Movie(seed, cpu_hz)
+        self.chip8 = self.movie.machine(rom)
+
+    def press_key(self, key):
+        self.movie.events.append((self.chip8.cycles, key, True))
+        self.chip8.press_key(key)
+
+    def release_key(self, key):
+        self.movie.events.append((self.chip8.cycles, key, False))
+        self.chip8.release_key(key)
+
+    def stop(self):
+        """
+        close the movie at the current cycle and return it
+        """
+        self.movie.length = self.chip8.cycles
+        self.movie.digest = state_digest(self.chip8)
+        return self.movie
+
+
+class MovieError(Exception):
+    """
+    use when a movie can not be parsed
+    """
+    def __init__(self, message):
+        self.message = f'movie could not be loaded: {message}'
+
+    def __str__(self):
+        return self.message
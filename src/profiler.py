@@ -0,0 +1,153 @@
+import json
+from collections import Counter
+from time import perf_counter_ns
+
+from .chip8 import PATTERNS, DecodeError
+from .extended import PATTERNS as EXTENDED_PATTERNS
+
+
+def run_instrumented(chip8, cycles, step, expired=None):
+    """
+    execute cycles instructions like Chip8.run(cycles, skip_idle=False),
+    calling step(pc, handler, operands) in place of every handler, step
+    runs the handler itself and may look at the machine around it,
+    expired() is called whenever a timer runs out
+
+    the loop of Profiler.run and TraceRecorder.run
+    """
+    table = chip8._decode_table
+    memory = chip8.memory
+    per_tick = chip8.cycles_per_tick
+    phase = chip8.timer_phase % per_tick  # as in Chip8.run
+    done = 0
+    chip8.draw_flag = False
+
+    try:
+        while done < cycles:
+            pc = chip8.pc
+            opcode = memory[pc] << 8 | memory[pc + 1]
+            chip8.opcode = opcode
+            entry = table[opcode]
+
+            if entry is None:
+                raise DecodeError(hex(opcode))
+
+            chip8.pc = pc + 2
+            step(pc, *entry)
+            done += 1
+            phase += 1
+
+            if phase == per_tick:
+                phase = 0
+
+                if chip8.delay_timer > 0:
+                    chip8.delay_timer -= 1
+
+                    if not chip8.delay_timer and expired is not None:
+                        expired()
+
+                if chip8.sound_timer > 0:
+                    chip8.sound_timer -= 1
+
+                    if not chip8.sound_timer and expired is not None:
+                        expired()
+    finally:
+        chip8.cycles += done
+        chip8.timer_phase = phase % per_tick
+
+    return done
+
+
+class Profiler:
+    """
+    instrumented Chip8.run loop, see run_instrumented
+
+    counts executions and wall time per opcode family and executions
+    per pc, draw calls, collisions and timers running out, and keeps
+    folded stacks keyed on the CALL / RET call stack
+
+    Chip8.run itself is untouched, a machine only pays for profiling
+    while it is driven through Profiler.run
+    """
+    def __init__(self, chip8):
+        self.chip8 = chip8
+        self.counts = Counter()  # family -> executions
+        self.times = Counter()  # family -> nanoseconds
+        self.pcs = Counter()  # pc -> executions
+        self.draws = 0
+        self.collisions = 0
+        self.timer_underflows = 0
+        self.frames = ['main']  # folded stack key of every open call
+        self.stacks = Counter()  # folded stack key -> executions
+
+    def run(self, cycles):
+        """
+        execute cycles instructions like Chip8.run(cycles)
+        """
+        c8 = self.chip8
+        cls = type(c8)
+        counts = self.counts
+        times = self.times
+        pcs = self.pcs
+        frames = self.frames
+        stacks = self.stacks
+        draw = cls.draw
+        call = cls.call
+        ret = cls.ret
+
+        def step(pc, handler, operands):
+            start = perf_counter_ns()
+            handler(c8, *operands)
+            elapsed = perf_counter_ns() - start
+
+            family = handler.__name__
+            counts[family] += 1
+            times[family] += elapsed
+            pcs[pc] += 1
+            stacks[frames[-1]] += 1
+
+            if handler is draw:
+                self.draws += 1
+                self.collisions += c8.regs[0xF]
+            elif handler is call:
+                frames.append(f'{frames[-1]};sub_{c8.pc:03x}')
+            elif handler is ret and len(frames) > 1:
+                frames.pop()
+
+        def expired():
+            self.timer_underflows += 1
+
+        return run_instrumented(c8, cycles, step, expired)
+
+    def report(self):
+        """
+        return the counters as a JSON-ready dict
+        """
+        families = {
+            family: {
+                'pattern': PATTERNS.get(family)
+                or EXTENDED_PATTERNS.get(family, family),
+                'count': count,
+                'ns': self.times[family],
+                'ns_per_op': self.times[family] / count,
+            }
+            for family, count in self.counts.most_common()
+        }
+        return {
+            'families': families,
+            'pcs': {f'{pc:03x}': count
+                    for pc, count in self.pcs.most_common()},
+            'draws': self.draws,
+            'collisions': self.collisions,
+            'timer_underflows': self.timer_underflows,
+        }
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def folded(self):
+        """
+        return the call stacks in the folded format flamegraph tools read
+        """
+        return ''.join(f'{stack} {count}\n'
+                       for stack, count in sorted(self.stacks.items()))
@@ -0,0 +1,173 @@
+"""
+quirk profiles
+
+the interpreters CHIP-8 programs were written for disagree on a few
+instructions, each profile is a Chip8 subclass that overrides just the
+handlers of its quirks, the choice is made once when the class builds
+its decode table and costs nothing per instruction
+
+             8XY6 8XYE  FX55 FX65  BNNN      DXYN    8XY1 8XY2 8XY3
+    chip8    vX         I kept     v0 + NNN  wrap    vF kept
+    vip      vY         I + X + 1  v0 + NNN  clip    vF = 0
+    chip48   vX         I + X      vX + XNN  clip    vF kept
+    schip    vX         I kept     vX + XNN  clip    vF kept
+    xochip   vY         I + X + 1  v0 + NNN  around  vF kept
+
+chip8 is the plain Chip8 class, its sprites wrap past the right edge
+onto the next row, xochip sprites wrap around to the same row
+
+schip and xochip also run the extended instruction sets in extended.py
+"""
+from .chip8 import Chip8
+from .extended import (SCHIP_SLOTS, XO_SLOTS, SuperChipInstructions,
+                       XoChipInstructions)
+
+
+class ShiftVy:
+    """
+    8XY6 and 8XYE shift vY into vX
+    """
+    __slots__ = ()
+
+    def shr(self, x, y):
+        regs = self.regs
+        val = regs[y]
+        regs[x] = val >> 1
+        regs[0xF] = val & 0x1
+
+    def shl(self, x, y):
+        regs = self.regs
+        val = regs[y]
+        regs[x] = (val << 1) & 0xFF
+        regs[0xF] = val >> 7
+
+
+class IndexIncrement:
+    """
+    FX55 and FX65 leave I pointing past the last register, I + X + 1
+    """
+    __slots__ = ()
+
+    def store_regs(self, x):
+        Chip8.store_regs(self, x)
+        self.index += x + 1
+
+    def read_regs(self, x):
+        Chip8.read_regs(self, x)
+        self.index += x + 1
+
+
+class IndexIncrementX:
+    """
+    FX55 and FX65 leave I at I + X, one short of the last register
+    """
+    __slots__ = ()
+
+    def store_regs(self, x):
+        Chip8.store_regs(self, x)
+        self.index += x
+
+    def read_regs(self, x):
+        Chip8.read_regs(self, x)
+        self.index += x
+
+
+class JumpVx:
+    """
+    BXNN jumps to XNN + vX
+    """
+    __slots__ = ()
+
+    def jump(self, nnn):
+        self.pc = self.regs[nnn >> 8] + nnn
+
+
+class Clip:
+    """
+    DXYN wraps the sprite position but clips the pixels past the edges
+    """
+    __slots__ = ()
+
+    def draw(self, x, y, n):
+        regs = self.regs
+        gfx = self.gfx
+        start = self.index
+
+        if start + n > len(self.memory):
+            raise IndexError('sprite data out of range')
+
+        sprite = self.memory[start:start + n]
+        regs[0xF] = gfx.blit_clip(regs[x] % gfx.width, regs[y] % gfx.height,
+                                  sprite)
+        self.draw_flag = True
+
+
+class ResetVf:
+    """
+    8XY1, 8XY2 and 8XY3 set vF = 0
+    """
+    __slots__ = ()
+
+    def bitwise_or(self, x, y):
+        regs = self.regs
+        regs[x] = regs[x] | regs[y]
+        regs[0xF] = 0
+
+    def bitwise_and(self, x, y):
+        regs = self.regs
+        regs[x] = regs[x] & regs[y]
+        regs[0xF] = 0
+
+    def bitwise_xor(self, x, y):
+        regs = self.regs
+        regs[x] = regs[x] ^ regs[y]
+        regs[0xF] = 0
+
+
+class CosmacVip(ShiftVy, IndexIncrement, Clip, ResetVf, Chip8):
+    """
+    the original COSMAC VIP interpreter
+    """
+    __slots__ = ()
+
+
+class Chip48(IndexIncrementX, JumpVx, Clip, Chip8):
+    """
+    CHIP-48 on the HP-48 calculators
+    """
+    __slots__ = ()
+
+
+class SuperChip(JumpVx, SuperChipInstructions, Chip8):
+    """
+    SUPER-CHIP 1.1
+    """
+    __slots__ = SCHIP_SLOTS
+
+
+class XoChip(ShiftVy, IndexIncrement, XoChipInstructions, Chip8):
+    """
+    XO-CHIP as run by Octo
+    """
+    __slots__ = XO_SLOTS
+
+
+PROFILES = {
+    'chip8': Chip8,
+    'vip': CosmacVip,
+    'chip48': Chip48,
+    'schip': SuperChip,
+    'xochip': XoChip,
+}
+
+
+def machine(profile='chip8', seed=None):
+    """
+    return a new machine with the quirks of profile
+    """
+    try:
+        cls = PROFILES[profile]
+    except KeyError:
+        raise ValueError(f'unknown quirk profile {profile!r}') from None
+
+    return cls(seed=seed)
@@ -0,0 +1,183 @@
+from array import array
+from collections import deque
+
+
+class Segment:
+    """
+    a full snapshot taken at cycle plus one undo delta for every cycle
+    executed after it
+    """
+    __slots__ = ('cycle', 'blob', 'deltas')
+
+    def __init__(self, cycle, blob):
+        self.cycle = cycle
+        self.blob = blob
+        self.deltas = []
+
+
+class Rewinder:
+    """
+    record a machine so it can be stepped back to any recent cycle
+
+    every interval cycles a snapshot is kept, in between each cycle
+    stores only what it changed: pc, index, sp, opcode and timers,
+    the registers or stack if they changed, the old bytes of memory
+    writes and the old value of changed framebuffer rows, the rng state
+    before CXNN and, on the extended profiles, the resolution and
+    extra_state() if they changed
+
+    at most segments snapshots, and their deltas, are kept, so the
+    history covers the last interval * segments cycles
+    """
+    def __init__(self, chip8, interval=600, segments=60):
+        self.chip8 = chip8
+        self.interval = interval
+        self.segments = deque(maxlen=segments)
+        self.shadow = bytearray(chip8.memory)  # memory before the last write
+        self.writes = []
+        self.extended = hasattr(chip8, 'extra_state')
+        chip8.write_listeners.append(self.on_write)
+
+    def detach(self):
+        self.chip8.write_listeners.remove(self.on_write)
+
+    def on_write(self, address, length):
+        end = address + length
+        self.writes.append((address, bytes(self.shadow[address:end])))
+        self.shadow[address:end] = self.chip8.memory[address:end]
+
+    @property
+    def oldest(self):
+        """
+        the earliest cycle that can be returned to
+        """
+        if not self.segments:
+            return self.chip8.cycles
+
+        return self.segments[0].cycle
+
+    def step(self):
+        """
+        execute one instruction and record how to undo it
+        """
+        c8 = self.chip8
+        segments = self.segments
+
+        if not segments or c8.cycles - segments[-1].cycle >= self.interval:
+            if self.shadow != c8.memory:
+                self.shadow[:] = c8.memory
+
+            segments.append(Segment(c8.cycles, c8.snapshot()))
+
+        state = (c8.pc, c8.index, c8.sp, c8.opcode, c8.delay_timer,
+                 c8.sound_timer, c8.timer_phase, c8.draw_flag)
+        regs = bytes(c8.regs)
+        stack = c8.stack.tobytes()
+        rows = list(c8.gfx.rows)
+        rng = c8.rng.getstate() if c8.memory[c8.pc] >> 4 == 0xC else None
+        extra = (c8.hires, c8.extra_state()) if self.extended else None
+        self.writes = []
+
+        c8.run(1)
+
+        if regs == c8.regs:
+            regs = None
+
+        if stack == c8.stack.tobytes():
+            stack = None
+
+        new_rows = c8.gfx.rows
+
+        if rows == new_rows:
+            rows = None
+        elif len(rows) != len(new_rows):
+            rows = list(enumerate(rows))
+        else:
+            rows = [(y, row) for y, row in enumerate(rows)
+                    if row != new_rows[y]]
+
+        if extra is not None and extra[1] == c8.extra_state():
+            extra = None
+
+        segments[-1].deltas.append((state, regs, stack, self.writes or None,
+                                    rows, rng, extra))
+
+    def run(self, cycles):
+        for _ in range(cycles):
+            self.step()
+
+    def step_back(self, cycles=1):
+        """
+        undo the last cycles instructions, return how many were undone
+        """
+        done = 0
+
+        while done < cycles and self.segments:
+            segment = self.segments[-1]
+
+            if not segment.deltas:
+                self.segments.pop()
+                continue
+
+            self.undo(segment.deltas.pop())
+            done += 1
+
+        return done
+
+    def seek(self, cycle):
+        """
+        return the machine to cycle, dropping the history after it
+        """
+        c8 = self.chip8
+
+        if not self.oldest <= cycle <= c8.cycles:
+            raise ValueError(f'cycle {cycle} is outside the rewind history')
+
+        while len(self.segments) > 1 and self.segments[-1].cycle > cycle:
+            segment = self.segments.pop()
+            c8.restore(segment.blob)
+
+        self.shadow[:] = c8.memory
+        self.step_back(c8.cycles - cycle)
+
+    def undo(self, delta):
+        c8 = self.chip8
+        state, regs, stack, writes, rows, rng, extra = delta
+        (c8.pc, c8.index, c8.sp, c8.opcode, c8.delay_timer, c8.sound_timer,
+         c8.timer_phase, c8.draw_flag) = state
+        c8.cycles -= 1
+
+        if regs is not None:
+            c8.regs[:] = regs
+
+        if stack is not None:
+            c8.stack[:] = array('H', stack)
+
+        if writes is not None:
+            for address, old in reversed(writes):
+                c8.memory[address:address + len(old)] = old
+                self.shadow[address:address + len(old)] = old
+
+            if c8.write_listeners:
+                for address, old in writes:
+                    c8.notify_write(address, len(old))
+
+        if rng is not None:
+            c8.rng.setstate(rng)
+
+        if extra is not None:
+            hires, blob = extra
+
+            # resizing clears the planes, rows then holds all of plane 0
+            if hires != c8.hires:
+                c8.set_resolution(hires)
+
+            c8.load_extra_state(blob)
+
+        if rows is not None:
+            gfx = c8.gfx
+
+            for y, row in rows:
+                gfx.rows[y] = row
+
+            gfx.dirty |= sum(1 << y for y, _ in rows)
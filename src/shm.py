@@ -0,0 +1,234 @@
+"""
+shared memory framebuffer
+
+FramePublisher copies the display of a machine into a named
+multiprocessing.shared_memory block, viewers in other processes read
+it from there without pipes or pickling, and one viewer can watch
+many machines:
+
+    python -m src.shm chip8-a chip8-b
+    python -m src.shm chip8-a --pbm frames
+
+the block holds a header, magic, width, height and a sequence number,
+and the pixels packed as by FrameBuffer.to_bytes(), the sequence is odd
+while a frame is being written, a reader that sees the same even
+sequence before and after copying the pixels has a whole frame
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from .chip8 import FrameBuffer
+
+FRAME_MAGIC = b'C8FB'
+FRAME_HEADER = struct.Struct('<4sHHQ')  # magic, width, height, sequence
+FRAME_SIZE = struct.Struct('<HH')
+FRAME_SEQUENCE = struct.Struct('<Q')
+SIZE_OFFSET = 4
+SEQUENCE_OFFSET = 8
+MAX_PIXELS = 128 * 64  # SUPER-CHIP and XO-CHIP high resolution
+
+PUBLISHED = set()  # names of the blocks created by this process
+
+
+class FramePublisher:
+    """
+    owner of a shared framebuffer block, publish() after running the
+    machine, close() removes the block
+    """
+    def __init__(self, chip8, name=None):
+        self.chip8 = chip8
+        self.shm = shared_memory.SharedMemory(
+            name, create=True, size=FRAME_HEADER.size + MAX_PIXELS // 8)
+        self.name = self.shm.name
+        PUBLISHED.add(self.name)
+        self.sequence = 0
+        self.last = None  # (width, height, pixels) last published
+        FRAME_HEADER.pack_into(self.shm.buf, 0, FRAME_MAGIC, 0, 0, 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def publish(self):
+        """
+        write the display into the block if it changed since the last
+        call, return True when a new frame was written
+        """
+        gfx = self.chip8.gfx
+        frame = (gfx.width, gfx.height, gfx.to_bytes())
+
+        if frame == self.last:
+            return False
+
+        buf = self.shm.buf
+        start = FRAME_HEADER.size
+        self.sequence += 1
+        FRAME_SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.sequence)
+        FRAME_SIZE.pack_into(buf, SIZE_OFFSET, gfx.width, gfx.height)
+        buf[start:start + len(frame[2])] = frame[2]
+        self.sequence += 1
+        FRAME_SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.sequence)
+        self.last = frame
+        return True
+
+    def close(self):
+        if self.shm is None:
+            return
+
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+        PUBLISHED.discard(self.name)
+
+
+class FrameReader:
+    """
+    attach to the block of a FramePublisher by name
+    """
+    def __init__(self, name):
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name)
+
+        # the publisher owns the block, do not unlink it on exit
+        if name not in PUBLISHED:
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+        if bytes(self.shm.buf[:4]) != FRAME_MAGIC:
+            self.shm.close()
+            raise FrameError(f'{name} is not a framebuffer')
+
+        self.last = (0, None)  # last whole frame read
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self, timeout=0.1):
+        """
+        return (frame, gfx) of the latest whole frame, frame counts the
+        frames published, gfx is a FrameBuffer or None before the first
+
+        a frame still being written after timeout seconds, as left by a
+        publisher that died mid-write, gives the last whole frame read
+        instead, or FrameError when there is none
+        """
+        buf = self.shm.buf
+        start = FRAME_HEADER.size
+        capacity = self.shm.size - start
+        deadline = time.monotonic() + timeout
+
+        while True:
+            sequence = FRAME_SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0]
+
+            if not sequence & 1:
+                width, height = FRAME_SIZE.unpack_from(buf, SIZE_OFFSET)
+                size = width * height // 8
+                pixels = None
+
+                if size <= capacity:
+                    pixels = bytes(buf[start:start + size])
+
+                if (FRAME_SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)[0]
+                        == sequence):
+                    if pixels is None:
+                        raise FrameError(f'{self.name} holds a {width}x'
+                                         f'{height} frame, larger than '
+                                         f'the block')
+
+                    break
+
+            if time.monotonic() > deadline:
+                if not self.last[0]:
+                    raise FrameError(f'{self.name} is stuck mid-frame')
+
+                return self.last
+
+            time.sleep(0)
+
+        if not sequence:
+            return 0, None
+
+        gfx = FrameBuffer(width, height)
+        gfx.load_bytes(pixels)
+        self.last = (sequence // 2, gfx)
+        return self.last
+
+    def close(self):
+        self.shm.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='watch shared framebuffers')
+    parser.add_argument('names', nargs='+', help='shared memory blocks')
+    parser.add_argument('--pbm', help='write every frame to this directory')
+    parser.add_argument('--hz', type=float, default=60,
+                        help='polls per second')
+    parser.add_argument('--once', action='store_true',
+                        help='show the current frames and exit')
+    args = parser.parse_args(argv)
+
+    try:
+        readers = [FrameReader(name) for name in args.names]
+    except (FileNotFoundError, FrameError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    shown = {}
+
+    try:
+        while readers:
+            for reader in list(readers):
+                try:
+                    frame, gfx = reader.read()
+                except FrameError as e:
+                    print(e, file=sys.stderr)
+                    readers.remove(reader)
+                    reader.close()
+                    continue
+
+                if gfx is None or shown.get(reader.name) == frame:
+                    continue
+
+                shown[reader.name] = frame
+
+                if args.pbm:
+                    name = f'{reader.name}-{frame:06d}.pbm'
+                    gfx.save_pbm(os.path.join(args.pbm, name))
+                else:
+                    print(f'; {reader.name} frame {frame}')
+                    print(gfx.render(on='#', off='.'))
+
+            if args.once:
+                return 0
+
+            time.sleep(1 / args.hz)
+
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+class FrameError(Exception):
+    """
+    use when a shared memory block can not be read as a framebuffer
+    """
+    def __init__(self, message):
+        self.message = f'framebuffer could not be read: {message}'
+
+    def __str__(self):
+        return self.message
+
+
+if __name__ == '__main__':
+    sys.exit(main())
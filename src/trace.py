@@ -0,0 +1,182 @@
+"""
+binary execution traces
+
+TraceRecorder runs a machine like Chip8.run and writes one fixed-width
+record per instruction:
+
+    cycle    u64  cycle count before the instruction
+    pc       u16
+    opcode   u16
+    index    u32  I after the instruction, FX1E may carry it past 16 bits
+    changed  u16  bit x set when vX changed
+    regs     16s  v0 - vF after the instruction
+
+records are packed into chunks of chunk_records and handed to a writer
+thread that deflates and appends them to the file, so compression does
+not stall the emulation; read_trace() yields the records back one by
+one, decompressing a chunk at a time
+"""
+import queue
+import struct
+import threading
+import zlib
+
+from .profiler import run_instrumented
+
+TRACE_MAGIC = b'C8T2'
+TRACE_HEADER = struct.Struct('<4sH')  # magic, record size
+TRACE_CHUNK = struct.Struct('<II')  # compressed size, record count
+TRACE_RECORD = struct.Struct('<QHHIH16s')
+
+CHUNK_RECORDS = 65536
+
+
+class TraceRecorder:
+    """
+    record every instruction a machine executes to path
+
+    use as a context manager or call close(), which waits for the
+    writer thread to flush the last chunk
+    """
+    def __init__(self, chip8, path, chunk_records=CHUNK_RECORDS, level=6):
+        self.chip8 = chip8
+        self.chunk_records = chunk_records
+        self.level = level
+        self.buffer = bytearray(chunk_records * TRACE_RECORD.size)
+        self.count = 0  # records in buffer
+        self.file = open(path, 'wb')
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_RECORD.size))
+        self.chunks = queue.Queue(maxsize=4)
+        self.error = None
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_chunks(self):
+        """
+        writer thread, compress and append chunks until a None arrives
+        """
+        file = self.file
+
+        while True:
+            chunk = self.chunks.get()
+
+            if chunk is None:
+                break
+
+            if self.error is not None:
+                continue
+
+            data, count = chunk
+
+            try:
+                packed = zlib.compress(data, self.level)
+                file.write(TRACE_CHUNK.pack(len(packed), count))
+                file.write(packed)
+            except OSError as e:
+                self.error = e
+
+    def flush_chunk(self):
+        if self.count:
+            size = self.count * TRACE_RECORD.size
+            self.chunks.put((bytes(self.buffer[:size]), self.count))
+            self.count = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        self.flush_chunk()
+        self.chunks.put(None)
+        self.writer.join()
+        self.file.close()
+
+        if self.error is not None:
+            raise self.error
+
+    def run(self, cycles):
+        """
+        execute cycles instructions like Chip8.run(cycles), recording each
+        """
+        c8 = self.chip8
+        regs = c8.regs
+        pack_into = TRACE_RECORD.pack_into
+        size = TRACE_RECORD.size
+        buffer = self.buffer
+        limit = self.chunk_records
+        cycle = c8.cycles
+
+        def step(pc, handler, operands):
+            nonlocal cycle
+            opcode = c8.opcode
+            before = bytes(regs)
+            handler(c8, *operands)
+            changed = 0
+
+            if before != regs:
+                for x in range(16):
+                    if before[x] != regs[x]:
+                        changed |= 1 << x
+
+            pack_into(buffer, self.count * size, cycle, pc, opcode,
+                      c8.index & 0xFFFFFFFF, changed, bytes(regs))
+            cycle += 1
+            self.count += 1
+
+            if self.count == limit:
+                self.flush_chunk()
+
+        return run_instrumented(c8, cycles, step)
+
+
+def read_trace(path):
+    """
+    yield the (cycle, pc, opcode, index, changed, regs) records of a trace
+    """
+    with open(path, 'rb') as f:
+        header = f.read(TRACE_HEADER.size)
+
+        try:
+            magic, size = TRACE_HEADER.unpack(header)
+        except struct.error:
+            raise TraceError('truncated header') from None
+
+        if magic != TRACE_MAGIC or size != TRACE_RECORD.size:
+            raise TraceError('not a trace')
+
+        while True:
+            chunk = f.read(TRACE_CHUNK.size)
+
+            if not chunk:
+                return
+
+            if len(chunk) < TRACE_CHUNK.size:
+                raise TraceError('truncated chunk')
+
+            length, count = TRACE_CHUNK.unpack(chunk)
+
+            try:
+                data = zlib.decompress(f.read(length))
+            except zlib.error as e:
+                raise TraceError(str(e)) from None
+
+            if len(data) != count * size:
+                raise TraceError('chunk size mismatch')
+
+            yield from TRACE_RECORD.iter_unpack(data)
+
+
+class TraceError(Exception):
+    """
+    use when a trace file can not be read
+    """
+    def __init__(self, message):
+        self.message = f'trace could not be read: {message}'
+
+    def __str__(self):
+        return self.message
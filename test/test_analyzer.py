@@ -0,0 +1,85 @@
+import unittest
+
+from src.analyzer import analyze, analyze_machine
+from src.blocks import BlockEngine
+from src.chip8 import Chip8
+
+
+def program(*opcodes):
+    c8 = Chip8()
+
+    for i, opcode in enumerate(opcodes):
+        c8.memory[c8.pc + 2 * i] = opcode >> 8
+        c8.memory[c8.pc + 2 * i + 1] = opcode & 0xFF
+
+    return c8
+
+
+class AnalyzerTest(unittest.TestCase):
+
+    def test_ibm_logo(self):
+        """
+        every instruction of the IBM logo is found and its sprites are data
+        """
+        analysis = analyze('2-ibm-logo.ch8')
+        observed = len(analysis.instructions)
+        self.assertEqual(21, observed)
+        observed = analysis.regions[0][:3]
+        self.assertEqual((0x22A, 15, 'sprite'), observed)
+        observed = analysis.overlaps
+        self.assertEqual([], observed)
+        observed = analysis.listing().splitlines()[0]
+        self.assertEqual('200  00e0      clear_screen', observed)
+
+    def test_cache(self):
+        """
+        the same rom and class give back the same analysis
+        """
+        observed = analyze('2-ibm-logo.ch8')
+        self.assertIs(analyze('2-ibm-logo.ch8'), observed)
+
+    def test_blocks(self):
+        """
+        skips and calls split the program into blocks
+        """
+        # 2206 3000 1200 00EE
+        c8 = program(0x2206, 0x3000, 0x1200, 0x00EE)
+        analysis = analyze_machine(c8)
+        observed = sorted(analysis.blocks)
+        self.assertEqual([0x200, 0x202, 0x204, 0x206], observed)
+        observed = analysis.blocks[0x202].successors
+        self.assertEqual((0x204, 0x206), observed)
+        self.assertEqual({0x206}, analysis.calls)
+
+    def test_overlaps(self):
+        """
+        FX55 writing over reachable code is reported
+        """
+        # A204 F155 1204
+        c8 = program(0xA204, 0xF155, 0x1204)
+        analysis = analyze_machine(c8)
+        observed = analysis.overlaps
+        self.assertEqual([0x204, 0x205], observed)
+
+    def test_indirect(self):
+        """
+        BNNN ends a path and is recorded as indirect
+        """
+        # B300 00E0
+        c8 = program(0xB300, 0x00E0)
+        analysis = analyze_machine(c8)
+        self.assertEqual({0x200}, analysis.indirect)
+        self.assertNotIn(0x202, analysis.instructions)
+
+    def test_warm(self):
+        """
+        warm compiles every analyzed block once
+        """
+        c8 = Chip8()
+        c8.load_rom('5-quirks.ch8')
+        analysis = analyze('5-quirks.ch8')
+        engine = BlockEngine(c8)
+        observed = engine.warm(analysis.blocks)
+        self.assertEqual(len(analysis.blocks), observed)
+        observed = engine.warm(analysis.blocks)
+        self.assertEqual(0, observed)
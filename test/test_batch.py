@@ -0,0 +1,90 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.quirks import CosmacVip
+
+try:
+    from src.batch import Chip8Batch
+except ImportError:  # numpy is optional
+    Chip8Batch = None
+
+
+def state(c8):
+    return (bytes(c8.memory), list(c8.gfx.rows), bytes(c8.regs),
+            list(c8.stack), c8.sp, c8.pc, c8.index, c8.delay_timer,
+            c8.sound_timer, c8.opcode, c8.draw_flag, c8.cycles)
+
+
+@unittest.skipIf(Chip8Batch is None, 'numpy is not installed')
+class Chip8BatchTest(unittest.TestCase):
+
+    def test_matches_chip8(self):
+        """
+        every lane ends in the same state as an independent Chip8
+        """
+        machines = []
+
+        for rom in ('1-chip8-logo.ch8', '4-flags.ch8', '5-quirks.ch8'):
+            c8 = Chip8()
+            c8.load_rom(rom)
+            c8.memory[0x1FF] = 1
+            machines.append(c8)
+
+        batch = Chip8Batch.from_machines(machines)
+        batch.run(500)
+
+        for lane, c8 in enumerate(machines):
+            for _ in range(0, 500):
+                c8.emulate_cycle()
+
+            self.assertEqual(state(c8), state(batch.machine(lane)))
+
+    def test_keys(self):
+        """
+        lanes with different keys take different branches
+        """
+        batch = Chip8Batch(2)
+        # 6005 E09E 6101 6202
+        batch.memory[:, 0x200:0x208] = [0x60, 0x05, 0xE0, 0x9E,
+                                        0x61, 0x01, 0x62, 0x02]
+        batch.press_key(1, 0x5)
+        batch.run(3)
+        observed = list(batch.regs[:, 1])
+        self.assertEqual([1, 0], observed)
+        observed = list(batch.regs[:, 2])
+        self.assertEqual([0, 2], observed)
+
+    def test_fault(self):
+        """
+        a lane stops on an opcode Chip8 can not decode
+        """
+        batch = Chip8Batch(2)
+        batch.memory[0, 0x200:0x202] = [0x80, 0x18]
+        batch.memory[1, 0x200:0x204] = [0x60, 0x18, 0x12, 0x02]
+        batch.run(2)
+        observed = list(batch.faulted)
+        self.assertEqual([True, False], observed)
+        observed = list(batch.cycles)
+        self.assertEqual([0, 2], observed)
+
+    def test_random_value(self):
+        """
+        lane i draws CXNN values like Chip8(seed=seeds[i])
+        """
+        batch = Chip8Batch(2, seeds=[3, 4])
+        batch.memory[:, 0x200:0x204] = [0xC0, 0xFF, 0xC1, 0x0F]
+        batch.run(2)
+
+        for lane, seed in enumerate((3, 4)):
+            c8 = Chip8(seed=seed)
+            c8.memory[0x200:0x204] = [0xC0, 0xFF, 0xC1, 0x0F]
+            c8.run(2)
+            observed = bytes(batch.regs[lane])
+            self.assertEqual(bytes(c8.regs), observed)
+
+    def test_profile(self):
+        """
+        machines with quirk profiles are refused
+        """
+        self.assertRaises(ValueError, Chip8Batch.from_machines,
+                          [Chip8(), CosmacVip()])
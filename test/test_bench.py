@@ -0,0 +1,34 @@
+import unittest
+
+from src.bench import MIXES, ROMS, regressions, run_benchmarks
+
+
+class BenchTest(unittest.TestCase):
+
+    def test_run_benchmarks(self):
+        """
+        report every rom and synthetic mix
+        """
+        report = run_benchmarks(cycles=200, repeat=1)
+        observed = sorted(report['benchmarks'])
+        self.assertEqual(sorted(ROMS + list(MIXES)), observed)
+        self.assertGreater(report['benchmarks']['alu']['run_ips'], 0)
+        observed = report['benchmarks']['draw']['ns_per_op']
+        self.assertIn('draw', observed)
+        self.assertGreater(report['bytes_per_instance'], 0)
+
+    def test_regressions(self):
+        """
+        flag benchmarks slower than the baseline by more than threshold
+        """
+        baseline = {'benchmarks': {'alu': {'ips': 1000},
+                                   'draw': {'ips': 1000}}}
+        report = {'benchmarks': {'alu': {'ips': 950},
+                                 'draw': {'ips': 850}}}
+        observed = regressions(report, baseline, 0.1)
+        self.assertEqual([('draw', 850, 1000)], observed)
+        baseline['benchmarks']['alu']['run_ips'] = 2000
+        report['benchmarks']['alu']['run_ips'] = 1000
+        observed = regressions(report, baseline, 0.1)
+        self.assertEqual([('alu run', 1000, 2000), ('draw', 850, 1000)],
+                         observed)
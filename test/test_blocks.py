@@ -0,0 +1,87 @@
+import unittest
+
+from src.blocks import BlockEngine
+from src.chip8 import Chip8
+
+
+def state(c8):
+    return (bytes(c8.memory), list(c8.gfx), bytes(c8.regs), list(c8.stack),
+            c8.sp, c8.pc, c8.index, c8.delay_timer, c8.sound_timer,
+            c8.opcode)
+
+
+class BlockEngineTest(unittest.TestCase):
+
+    def test_matches_emulate_cycle(self):
+        """
+        running blocks leaves the machine as emulate_cycle would
+        """
+        expected = Chip8(seed=0)
+        expected.load_rom('5-quirks.ch8')
+        expected.memory[0x1FF] = 1
+
+        for _ in range(0, 3000):
+            expected.emulate_cycle()
+
+        c8 = Chip8(seed=0)
+        c8.load_rom('5-quirks.ch8')
+        c8.memory[0x1FF] = 1
+        observed = BlockEngine(c8).run(3000)
+        self.assertEqual(3000, observed)
+        self.assertEqual(state(expected), state(c8))
+
+    def test_timers(self):
+        """
+        timers count down once per instruction inside a block
+        """
+        c8 = Chip8()
+        c8.memory[0x200:0x208] = [0x60, 0x05, 0xF0, 0x15, 0x61, 0x01,
+                                  0xF2, 0x07]
+        BlockEngine(c8).run(4)
+        observed = c8.regs[2]
+        self.assertEqual(3, observed)
+        observed = c8.delay_timer
+        self.assertEqual(2, observed)
+
+    def test_self_modifying(self):
+        """
+        FX55 writing into a cached block invalidates it
+        """
+        c8 = Chip8()
+        # 6012 A204 F055 6033 1204
+        c8.memory[0x200:0x20A] = [0x60, 0x12, 0xA2, 0x08, 0xF0, 0x55,
+                                  0x60, 0x33, 0x12, 0x08]
+        engine = BlockEngine(c8)
+        engine.compile(0x206)
+        self.assertIn(0x206, engine.blocks)
+        engine.run(3)
+        self.assertNotIn(0x206, engine.blocks)
+        observed = c8.memory[0x208]
+        self.assertEqual(0x12, observed)
+
+    def test_invalidate(self):
+        """
+        invalidate drops blocks after a direct memory write
+        """
+        c8 = Chip8()
+        c8.memory[0x200:0x202] = [0x60, 0x01]
+        engine = BlockEngine(c8)
+        engine.step()
+        c8.pc = 0x200
+        c8.memory[0x201] = 0x02
+        engine.invalidate(0x201, 1)
+        engine.step()
+        observed = c8.regs[0]
+        self.assertEqual(0x02, observed)
+
+    def test_rewrite_during_run(self):
+        """
+        a block rewritten inside one run call is not executed again
+        """
+        c8 = Chip8()
+        # 6061 A200 F055 1200, F055 turns 6061 into 6161
+        c8.memory[0x200:0x208] = [0x60, 0x61, 0xA2, 0x00, 0xF0, 0x55,
+                                  0x12, 0x00]
+        BlockEngine(c8).run(8)
+        observed = c8.regs[1]
+        self.assertEqual(0x61, observed)
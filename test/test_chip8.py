@@ -1,6 +1,10 @@
+import io
+import os
+import tempfile
 import unittest
+import zipfile
 
-from src.chip8 import Chip8
+from src.chip8 import Chip8, DecodeError, RomError, SnapshotError, read_rom
 
 
 class Chip8Test(unittest.TestCase):
@@ -340,3 +344,346 @@ class Chip8Test(unittest.TestCase):
         c8.emulate_cycle()
         observed = c8.pc
         self.assertEqual(0x0204, observed)
+
+    # invalid opcode
+    def test_decode_error(self):
+        """
+        raise DecodeError for opcodes that can not be decoded
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0x80
+        c8.memory[c8.pc + 1] = 0x18
+        self.assertRaises(DecodeError, c8.emulate_cycle)
+
+    # decode table
+    def test_decode_table(self):
+        """
+        every opcode maps to its handler and pre-extracted operands
+        """
+        table = Chip8.build_decode_table()
+        self.assertEqual(0x10000, len(table))
+        observed = table[0xD123]
+        self.assertEqual((Chip8.draw, (0x1, 0x2, 0x3)), observed)
+        observed = table[0xF233]
+        self.assertEqual((Chip8.store_bcd, (0x2,)), observed)
+        observed = table[0xE0FF]
+        self.assertIsNone(observed)
+
+    # machine state
+    def test_compact_state(self):
+        """
+        machine state lives in fixed-size byte buffers with no __dict__
+        """
+        c8 = Chip8()
+        self.assertFalse(hasattr(c8, '__dict__'))
+        self.assertEqual(4096, len(c8.memory))
+        self.assertEqual(2048, len(c8.gfx))
+        self.assertIsInstance(c8.memory, bytearray)
+        self.assertIsInstance(c8.regs, bytearray)
+        self.assertIsInstance(c8.keys, bytearray)
+
+    # DXYN
+    def test_draw(self):
+        """
+        draw 8xN pixel sprite at position vX, vY
+        with data starting at the address in I
+        set vF = collision
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0xD0
+        c8.memory[c8.pc + 1] = 0x11
+        c8.memory[c8.pc + 2] = 0xD0
+        c8.memory[c8.pc + 3] = 0x11
+        c8.memory[0x300] = 0b10000001
+        c8.index = 0x300
+        c8.regs[0] = 60
+        c8.regs[1] = 31
+        c8.emulate_cycle()
+        observed = c8.gfx[60 + 31 * 64]
+        self.assertEqual(1, observed)
+        observed = c8.gfx[3]
+        self.assertEqual(1, observed)
+        observed = sum(c8.gfx)
+        self.assertEqual(2, observed)
+        observed = c8.regs[0xF]
+        self.assertEqual(0, observed)
+        c8.emulate_cycle()
+        observed = sum(c8.gfx)
+        self.assertEqual(0, observed)
+        observed = c8.regs[0xF]
+        self.assertEqual(1, observed)
+
+    # 00E0
+    def test_clear_screen(self):
+        """
+        clear the screen
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0x00
+        c8.memory[c8.pc + 1] = 0xE0
+        c8.gfx[5 + 3 * 64] = 1
+        observed = c8.gfx.rows[3]
+        self.assertEqual(1 << 58, observed)
+        c8.emulate_cycle()
+        observed = sum(c8.gfx)
+        self.assertEqual(0, observed)
+
+    # run
+    def test_run(self):
+        """
+        run a batch of instructions, timers tick at timer_hz
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0x12
+        c8.memory[c8.pc + 1] = 0x00
+        c8.delay_timer = 5
+        c8.cpu_hz = 600
+        observed = c8.run(25)
+        self.assertEqual(25, observed)
+        observed = c8.delay_timer
+        self.assertEqual(3, observed)
+        observed = c8.timer_phase
+        self.assertEqual(5, observed)
+        observed = c8.run_frame()
+        self.assertEqual(5, observed)
+        observed = c8.delay_timer
+        self.assertEqual(2, observed)
+        observed = c8.cycles
+        self.assertEqual(30, observed)
+        self.assertIsNone(c8.stop_reason)
+
+    def test_run_rate_change(self):
+        """
+        timers keep ticking after cpu_hz drops below the timer phase
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0x12
+        c8.memory[c8.pc + 1] = 0x00
+        c8.cpu_hz = 600
+        c8.run(8, skip_idle=False)
+        c8.cpu_hz = 300
+        c8.delay_timer = 50
+        observed = c8.run_frame()
+        self.assertEqual(2, observed)
+        observed = c8.delay_timer
+        self.assertEqual(49, observed)
+        c8.run(1000, skip_idle=False)
+        observed = c8.delay_timer
+        self.assertEqual(0, observed)
+
+    # run until
+    def test_run_until(self):
+        """
+        stop a batch early on draw, key wait, halt and breakpoints
+        """
+        c8 = Chip8()
+        # 6001 D001 F00A 1206
+        c8.memory[0x200:0x208] = [0x60, 0x01, 0xD0, 0x01, 0xF0, 0x0A,
+                                  0x12, 0x06]
+        observed = c8.run(100, until=('draw',))
+        self.assertEqual(2, observed)
+        self.assertEqual('draw', c8.stop_reason)
+        self.assertTrue(c8.draw_flag)
+        observed = c8.run(100, until=('key_wait',))
+        self.assertEqual(0, observed)
+        self.assertEqual('key_wait', c8.stop_reason)
+        observed = c8.pc
+        self.assertEqual(0x204, observed)
+        c8.press_key(0x3)
+        observed = c8.run(100, breakpoints=(0x206,))
+        self.assertEqual(1, observed)
+        self.assertEqual('breakpoint', c8.stop_reason)
+        observed = c8.regs[0]
+        self.assertEqual(0x3, observed)
+        observed = c8.run(100, until=('halt',))
+        self.assertEqual(1, observed)
+        self.assertEqual('halt', c8.stop_reason)
+
+    # skip idle
+    def test_skip_idle(self):
+        """
+        skipping a delay timer wait ends in the same state as running it
+        """
+        # 6014 F015 F007 3000 1204 7001 1200
+        rom = bytes([0x60, 0x14, 0xF0, 0x15, 0xF0, 0x07, 0x30, 0x00,
+                     0x12, 0x04, 0x71, 0x01, 0x12, 0x00])
+        skipped = Chip8(seed=0)
+        skipped.load_rom(rom)
+        stepped = Chip8(seed=0)
+        stepped.load_rom(rom)
+
+        for cycles in (7, 100, 250, 1000):
+            observed = skipped.run(cycles)
+            expected = stepped.run(cycles, skip_idle=False)
+            self.assertEqual(expected, observed)
+            observed = skipped.snapshot()
+            expected = stepped.snapshot()
+            self.assertEqual(expected, observed)
+
+        self.assertLess(0, skipped.skipped)
+        self.assertEqual(0, stepped.skipped)
+
+    # run until idle
+    def test_run_until_idle(self):
+        """
+        a self jump or a key wait uses up the batch at once, or stops it
+        """
+        c8 = Chip8()
+        # E19E 1200 1204
+        c8.memory[0x200:0x206] = [0xE1, 0x9E, 0x12, 0x00, 0x12, 0x04]
+        c8.sound_timer = 3
+        observed = c8.run(10 ** 9)
+        self.assertEqual(10 ** 9, observed)
+        observed = c8.sound_timer
+        self.assertEqual(0, observed)
+        observed = c8.run(100, until=('idle',))
+        self.assertEqual(2, observed)
+        self.assertEqual('idle', c8.stop_reason)
+        c8.press_key(0x0)
+        observed = c8.run(100, until=('idle',))
+        self.assertEqual(2, observed)
+        observed = c8.pc
+        self.assertEqual(0x204, observed)
+
+    # dirty rows
+    def test_dirty_rows(self):
+        """
+        draw and clear_screen mark the rows they change as dirty
+        """
+        c8 = Chip8()
+        c8.gfx.take_dirty()
+        c8.memory[c8.pc] = 0xD0
+        c8.memory[c8.pc + 1] = 0x12
+        c8.memory[c8.pc + 2] = 0x00
+        c8.memory[c8.pc + 3] = 0xE0
+        c8.memory[0x300] = 0xFF
+        c8.index = 0x300
+        c8.regs[1] = 4
+        c8.emulate_cycle()
+        observed = c8.gfx.take_dirty()
+        self.assertEqual(0b10000, observed)
+        observed = c8.gfx.take_dirty()
+        self.assertEqual(0, observed)
+        c8.emulate_cycle()
+        observed = c8.gfx.take_dirty()
+        self.assertEqual(0b10000, observed)
+
+    # frame export
+    def test_frame_export(self):
+        """
+        hash, render and export the display
+        """
+        c8 = Chip8()
+        blank = c8.gfx.digest()
+        c8.gfx[0] = 1
+        c8.gfx[64 * 32 - 1] = 1
+        observed = c8.gfx.digest()
+        self.assertNotEqual(blank, observed)
+        self.assertLess(observed, 1 << 64)
+        other = Chip8()
+        other.gfx.load_bytes(c8.gfx.to_bytes())
+        self.assertEqual(observed, other.gfx.digest())
+        lines = c8.gfx.render('#', '.').split('\n')
+        self.assertEqual(32, len(lines))
+        self.assertEqual('#' + '.' * 63, lines[0])
+        self.assertEqual('.' * 63 + '#', lines[31])
+        observed = c8.gfx.to_pbm()
+        self.assertEqual(b'P4\n64 32\n' + c8.gfx.to_bytes(), observed)
+        observed = c8.gfx.to_png()
+        self.assertEqual(b'\x89PNG\r\n\x1a\n', observed[:8])
+        self.assertEqual(b'IEND', observed[-8:-4])
+
+    # snapshot
+    def test_snapshot(self):
+        """
+        restore a snapshot into another machine
+        """
+        c8 = Chip8()
+        c8.load_rom('5-quirks.ch8')
+        c8.memory[0x1FF] = 1
+
+        for _ in range(0, 500):
+            c8.emulate_cycle()
+
+        blob = c8.snapshot()
+        other = Chip8()
+        other.restore(blob)
+        observed = other.snapshot()
+        self.assertEqual(blob, observed)
+        observed = list(other.gfx)
+        self.assertEqual(list(c8.gfx), observed)
+        observed = (other.pc, other.index, other.cycles)
+        self.assertEqual((c8.pc, c8.index, c8.cycles), observed)
+        c8.emulate_cycle()
+        other.emulate_cycle()
+        self.assertEqual(c8.snapshot(), other.snapshot())
+        self.assertRaises(SnapshotError, other.restore, blob[:-1])
+        self.assertRaises(SnapshotError, other.restore, b'XXXX' + blob[4:])
+
+    def test_snapshot_rng(self):
+        """
+        CXNN draws the same values after restoring a snapshot
+        """
+        c8 = Chip8()
+        # C0FF C1FF
+        c8.memory[0x200:0x204] = [0xC0, 0xFF, 0xC1, 0xFF]
+        blob = c8.snapshot()
+        c8.run(2)
+        expected = bytes(c8.regs[:2])
+        other = Chip8()
+        other.restore(blob)
+        other.run(2)
+        observed = bytes(other.regs[:2])
+        self.assertEqual(expected, observed)
+
+    # load rom
+    def test_load_rom(self):
+        """
+        load a rom from a path, bytes, a file-like object or a zip archive
+        """
+        with open('2-ibm-logo.ch8', 'rb') as rom:
+            data = rom.read()
+
+        buffer = io.BytesIO()
+
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('ibm.ch8', data)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'roms.zip')
+
+            with open(path, 'wb') as f:
+                f.write(buffer.getvalue())
+
+            sources = ['2-ibm-logo.ch8', data, io.BytesIO(data), path]
+
+            for source in sources:
+                c8 = Chip8()
+                c8.load_rom(source)
+                observed = bytes(c8.memory[0x200:0x200 + len(data)])
+                self.assertEqual(data, observed)
+
+            self.assertRaises(RomError, Chip8().load_rom, path, 'other.ch8')
+
+        self.assertIs(read_rom('2-ibm-logo.ch8'), read_rom('2-ibm-logo.ch8'))
+        self.assertIs(data, read_rom(data))
+        self.assertRaises(RomError, Chip8().load_rom, bytes(0xE01))
+        self.assertRaises(RomError, Chip8().load_rom, b'')
+
+    # tick timers
+    def test_tick_timers(self):
+        """
+        leave the timers to the host clock
+        """
+        c8 = Chip8()
+        c8.memory[c8.pc] = 0x12
+        c8.memory[c8.pc + 1] = 0x00
+        c8.delay_timer = 2
+        c8.sound_timer = 1
+        c8.run(100, tick=False)
+        observed = (c8.delay_timer, c8.sound_timer)
+        self.assertEqual((2, 1), observed)
+        c8.tick_timers()
+        c8.tick_timers()
+        observed = (c8.delay_timer, c8.sound_timer)
+        self.assertEqual((0, 0), observed)
@@ -0,0 +1,104 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.debugger import ConditionError, Debugger
+
+
+def program(*opcodes):
+    c8 = Chip8()
+
+    for i, opcode in enumerate(opcodes):
+        c8.memory[c8.pc + 2 * i] = opcode >> 8
+        c8.memory[c8.pc + 2 * i + 1] = opcode & 0xFF
+
+    return c8
+
+
+# 7301 1200, count v3 up forever
+COUNTER = (0x7301, 0x1200)
+
+
+class DebuggerTest(unittest.TestCase):
+
+    def test_no_breakpoints(self):
+        """
+        with nothing set the whole batch runs
+        """
+        c8 = program(*COUNTER)
+        debugger = Debugger(c8)
+        observed = debugger.run(100)
+        self.assertEqual(100, observed)
+        self.assertIsNone(debugger.stop_reason)
+        self.assertEqual(50, c8.regs[3])
+
+    def test_breakpoint(self):
+        """
+        stop before the instruction at a breakpoint
+        """
+        c8 = program(*COUNTER)
+        debugger = Debugger(c8)
+        debugger.break_at(0x202)
+        observed = debugger.run(100)
+        self.assertEqual(1, observed)
+        self.assertEqual('breakpoint', debugger.stop_reason)
+        self.assertEqual(0x202, debugger.hit)
+        observed = debugger.run(100)
+        self.assertEqual(2, observed)
+
+    def test_condition(self):
+        """
+        a conditional breakpoint only stops when its condition holds
+        """
+        c8 = program(*COUNTER)
+        debugger = Debugger(c8)
+        debugger.break_at(0x200, 'V3 == 0x10')
+        debugger.run(1000)
+        observed = c8.regs[3]
+        self.assertEqual(0x10, observed)
+        self.assertEqual(0x200, c8.pc)
+        self.assertRaises(ConditionError, debugger.break_at, 0x200,
+                          '__import__("os")')
+        self.assertRaises(ConditionError, debugger.break_at, 0x200, 'V3 ==')
+        self.assertRaises(ConditionError, debugger.break_at, 0x200,
+                          '2 ** 10 ** 10')
+
+    def test_watchpoint(self):
+        """
+        stop after an instruction writes a watched address
+        """
+        # A300 F033 7001 1202
+        c8 = program(0xA300, 0xF033, 0x7001, 0x1202)
+        debugger = Debugger(c8)
+        debugger.watch(0x302)
+        observed = debugger.run(100)
+        self.assertEqual(2, observed)
+        self.assertEqual('watchpoint', debugger.stop_reason)
+        self.assertEqual(0x302, debugger.hit)
+        debugger.unwatch()
+        self.assertEqual([], c8.write_listeners)
+
+    def test_trace(self):
+        """
+        the trace log keeps the last instructions
+        """
+        c8 = program(*COUNTER)
+        debugger = Debugger(c8, trace=2)
+        debugger.run(5)
+        observed = debugger.trace_lines()
+        expected = [
+            '       3  202  1200  goto 0x200',
+            '       4  200  7301  add_constant v3, 0x01',
+        ]
+        self.assertEqual(expected, observed)
+
+    def test_back(self):
+        """
+        step the machine backwards
+        """
+        c8 = program(*COUNTER)
+        debugger = Debugger(c8, trace=10, rewind=True)
+        debugger.run(10)
+        observed = debugger.back(4)
+        self.assertEqual(4, observed)
+        self.assertEqual(3, c8.regs[3])
+        self.assertEqual(6, len(debugger.trace))
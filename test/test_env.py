@@ -0,0 +1,61 @@
+import unittest
+
+from src.chip8 import Chip8
+
+try:
+    from src.env import Chip8Env
+except ImportError:  # numpy is optional
+    Chip8Env = None
+
+
+@unittest.skipIf(Chip8Env is None, 'numpy is not installed')
+class Chip8EnvTest(unittest.TestCase):
+
+    def test_step(self):
+        """
+        steps run frame_skip frames and observe the display
+        """
+        env = Chip8Env('2-ibm-logo.ch8', frame_skip=4)
+        observation, info = env.reset()
+        self.assertEqual(0, observation.sum())
+
+        for _ in range(0, 30):
+            step = env.step(0)
+
+        observed = step[4]
+        self.assertEqual({'cycles': 1200, 'steps': 30}, observed)
+        self.assertTrue(step[2])
+
+        c8 = Chip8()
+        c8.load_rom('2-ibm-logo.ch8')
+        c8.run(1200)
+        observed = [int(pixel) for pixel in step[0].flat]
+        self.assertEqual(list(c8.gfx), observed)
+
+    def test_reset(self):
+        """
+        reset reuses the observation buffer and restores the boot state
+        """
+        env = Chip8Env('6-keypad.ch8', max_steps=2)
+        observation, _ = env.reset()
+        env.step(6)
+        observed = env.step(6)
+        self.assertTrue(observed[3])
+        self.assertIs(observation, observed[0])
+
+        reset, _ = env.reset()
+        self.assertIs(observation, reset)
+        self.assertEqual(0, env.chip8.cycles)
+        self.assertEqual(0, sum(env.chip8.keys))
+
+    def test_rate_change(self):
+        """
+        a step ends on a frame boundary after cpu_hz drops
+        """
+        env = Chip8Env('2-ibm-logo.ch8', frame_skip=1)
+        env.reset()
+        env.chip8.run(8)
+        env.chip8.cpu_hz = 300
+        env.step(0)
+        observed = env.chip8.cycles
+        self.assertEqual(10, observed)
@@ -0,0 +1,166 @@
+import unittest
+
+from src.chip8 import SnapshotError
+from src.extended import BIG_FONT_START
+from src.quirks import SuperChip, XoChip
+
+
+def program(cls, *opcodes):
+    c8 = cls()
+
+    for i, opcode in enumerate(opcodes):
+        c8.memory[c8.pc + 2 * i] = opcode >> 8
+        c8.memory[c8.pc + 2 * i + 1] = opcode & 0xFF
+
+    return c8
+
+
+class ExtendedTest(unittest.TestCase):
+
+    # 00FF 00FE
+    def test_resolution(self):
+        """
+        switch between 64x32 and 128x64, clearing the display
+        """
+        c8 = program(SuperChip, 0x00FF, 0x00FE)
+        c8.gfx[0] = 1
+        c8.run(1)
+        observed = (c8.gfx.width, c8.gfx.height, c8.hires)
+        self.assertEqual((128, 64, True), observed)
+        self.assertEqual([0] * 64, c8.gfx.rows)
+        c8.run(1)
+        observed = (c8.gfx.width, c8.gfx.height, c8.hires)
+        self.assertEqual((64, 32, False), observed)
+
+    # 00CN 00FB 00FC
+    def test_scroll(self):
+        """
+        scroll down, right and left by shifting rows
+        """
+        c8 = program(SuperChip, 0x00C2, 0x00FB, 0x00FC, 0x00FC)
+        c8.gfx.rows[0] = 0xF0 << 56
+        c8.run(1)
+        observed = c8.gfx.rows[2]
+        self.assertEqual(0xF0 << 56, observed)
+        observed = c8.gfx.rows[0]
+        self.assertEqual(0, observed)
+        c8.run(1)
+        observed = c8.gfx.rows[2]
+        self.assertEqual(0x0F << 56, observed)
+        c8.run(2)
+        observed = c8.gfx.rows[2]
+        self.assertEqual(0, observed)
+
+    # DXY0
+    def test_draw_16x16(self):
+        """
+        DXY0 draws a 16x16 sprite clipped at the edges
+        """
+        c8 = program(SuperChip, 0x00FF, 0xD010)
+        c8.memory[0x300:0x320] = b'\xff' * 32
+        c8.index = 0x300
+        c8.regs[0] = 120
+        c8.regs[1] = 60
+        c8.run(2)
+        observed = c8.gfx.rows[60:]
+        self.assertEqual([0xFF] * 4, observed)
+        observed = sum(c8.gfx.rows[:60])
+        self.assertEqual(0, observed)
+
+    # FX29 FX30 FX75 FX85
+    def test_font_and_flags(self):
+        """
+        point I at font digits and keep registers in the flags
+        """
+        c8 = program(SuperChip, 0xF129, 0xF130, 0xF175, 0x6000, 0x6100,
+                     0xF185)
+        c8.regs[0] = 0x12
+        c8.regs[1] = 0xA
+        c8.run(1)
+        observed = c8.index
+        self.assertEqual(50, observed)
+        c8.run(1)
+        observed = c8.index
+        self.assertEqual(BIG_FONT_START + 100, observed)
+        c8.run(4)
+        observed = bytes(c8.regs[:2])
+        self.assertEqual(b'\x12\x0a', observed)
+
+    # F000 NNNN
+    def test_long_index(self):
+        """
+        load a 16-bit I, skips step over the whole instruction
+        """
+        c8 = program(XoChip, 0xF000, 0xBEEF, 0x3000, 0xF000, 0x1234,
+                     0x6001)
+        c8.run(1)
+        observed = (c8.index, c8.pc)
+        self.assertEqual((0xBEEF, 0x204), observed)
+        c8.run(1)
+        observed = c8.pc
+        self.assertEqual(0x20A, observed)
+        self.assertEqual(0x10000, len(c8.memory))
+
+    # 5XY2 5XY3
+    def test_range(self):
+        """
+        store and read a range of registers in either order
+        """
+        c8 = program(XoChip, 0x5132, 0x5313)
+        c8.regs[1:4] = b'\x01\x02\x03'
+        c8.index = 0x300
+        c8.run(1)
+        observed = bytes(c8.memory[0x300:0x303])
+        self.assertEqual(b'\x01\x02\x03', observed)
+        c8.run(1)
+        observed = bytes(c8.regs[1:4])
+        self.assertEqual(b'\x03\x02\x01', observed)
+        observed = c8.index
+        self.assertEqual(0x300, observed)
+
+    # FN01 DXYN 00DN
+    def test_planes(self):
+        """
+        draw to both planes with consecutive sprite data, scroll up
+        """
+        c8 = program(XoChip, 0xF301, 0xD011, 0x00D1)
+        c8.memory[0x300:0x302] = b'\x80\x01'
+        c8.index = 0x300
+        c8.regs[1] = 1
+        c8.run(2)
+        observed = [plane.rows[1] for plane in c8.planes]
+        self.assertEqual([0x80 << 56, 0x01 << 56], observed)
+        c8.run(1)
+        observed = [plane.rows[0] for plane in c8.planes]
+        self.assertEqual([0x80 << 56, 0x01 << 56], observed)
+
+    def test_wrap_around(self):
+        """
+        XO-CHIP sprites wrap around to the same row
+        """
+        c8 = program(XoChip, 0xD011)
+        c8.memory[0x300] = 0xFF
+        c8.index = 0x300
+        c8.regs[0] = 60
+        c8.run(1)
+        observed = c8.gfx.rows[0]
+        self.assertEqual(0xF000000000000000 | 0xF, observed)
+
+    def test_snapshot(self):
+        """
+        restore resolution, flags and both planes
+        """
+        c8 = program(XoChip, 0x00FF, 0xF301, 0xD015)
+        c8.memory[0x300:0x30A] = bytes(range(1, 11))
+        c8.index = 0x300
+        c8.flags[0] = 7
+        c8.run(3)
+        blob = c8.snapshot()
+        other = XoChip()
+        other.restore(blob)
+        self.assertEqual(blob, other.snapshot())
+        observed = (other.gfx.width, other.hires, other.flags[0])
+        self.assertEqual((128, True, 7), observed)
+        self.assertEqual(c8.planes[1].rows, other.planes[1].rows)
+        self.assertRaises(SnapshotError, SuperChip().restore, blob)
+        self.assertRaises(SnapshotError, other.restore, blob[:10])
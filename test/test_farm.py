@@ -0,0 +1,90 @@
+import unittest
+
+from src.farm import KeyScriptError, build_jobs, parse_key_script, run_farm
+from src.farm import check_golden, golden_key, run_job
+
+
+class FarmTest(unittest.TestCase):
+
+    def test_parse_key_script(self):
+        """
+        parse key events sorted by cycle, skipping comments
+        """
+        observed = parse_key_script('# keys\n20 release a\n10 press A\n\n')
+        self.assertEqual([(10, 0xA, True), (20, 0xA, False)], observed)
+        self.assertRaises(KeyScriptError, parse_key_script, '10 hold 1')
+        self.assertRaises(KeyScriptError, parse_key_script, '10 press 10')
+
+    def test_run_job(self):
+        """
+        run a ROM for its budget and report the final machine state
+        """
+        observed = run_job({'rom': '1-chip8-logo.ch8', 'cycles': 40})
+        self.assertEqual(40, observed['cycles'])
+        self.assertEqual(16, len(observed['frame']))
+        self.assertEqual(32, len(observed['regs']))
+        self.assertIsNone(observed['error'])
+        self.assertEqual(0, observed['skipped'])
+        observed = run_job({'rom': '1-chip8-logo.ch8', 'cycles': 40,
+                            'profile': 'vip'})['profile']
+        self.assertEqual('vip', observed)
+
+    def test_run_job_error(self):
+        """
+        a rom that can not be loaded fails its job only
+        """
+        observed = run_job({'rom': 'missing.ch8', 'cycles': 40})
+        self.assertEqual(0, observed['cycles'])
+        self.assertIsNotNone(observed['error'])
+        jobs = build_jobs(['missing.ch8', '2-ibm-logo.ch8'], [20])
+        observed = [r['error'] is None for r in run_farm(jobs, 2)]
+        self.assertEqual([False, True], observed)
+
+    def test_run_job_skip_idle(self):
+        """
+        skipped instructions count in cycles but not in cps
+        """
+        job = {'rom': '2-ibm-logo.ch8', 'cycles': 10 ** 7, 'skip_idle': True}
+        observed = run_job(job)
+        self.assertEqual(10 ** 7, observed['cycles'])
+        self.assertEqual(10 ** 7 - 21, observed['skipped'])
+        self.assertLess(observed['cps'], 10 ** 9)
+
+    def test_run_job_keys(self):
+        """
+        key events fire at their cycle
+        """
+        job = {'rom': '6-keypad.ch8', 'cycles': 10,
+               'events': [(3, 0x7, True)]}
+        observed = run_job(job)
+        self.assertEqual(10, observed['cycles'])
+        self.assertIsNone(observed['error'])
+        job['events'] = [(30, 0x7, True)]
+        observed = run_job(job)
+        self.assertEqual(10, observed['cycles'])
+
+    def test_run_farm(self):
+        """
+        results come back in job order
+        """
+        jobs = build_jobs(['1-chip8-logo.ch8', '2-ibm-logo.ch8'], [20, 40])
+        observed = [(r['rom'], r['cycles']) for r in run_farm(jobs, 2)]
+        expected = [('1-chip8-logo.ch8', 20), ('1-chip8-logo.ch8', 40),
+                    ('2-ibm-logo.ch8', 20), ('2-ibm-logo.ch8', 40)]
+        self.assertEqual(expected, observed)
+
+    def test_check_golden(self):
+        """
+        frames are compared against stored hashes by rom, cycles and keys
+        """
+        results = [run_job({'rom': '2-ibm-logo.ch8', 'cycles': 100}),
+                   run_job({'rom': '1-chip8-logo.ch8', 'cycles': 100})]
+        golden = {golden_key(results[0]): results[0]['frame'],
+                  golden_key(results[1]): '0' * 16}
+        observed = check_golden(results, golden)
+        self.assertEqual([results[1]], observed)
+        observed = [result['golden'] for result in results]
+        self.assertEqual([True, False], observed)
+        check_golden(results, {})
+        observed = results[0]['golden']
+        self.assertIsNone(observed)
@@ -0,0 +1,39 @@
+import random
+import unittest
+
+from src.chip8 import Chip8
+from src.fuzz import (FAULT, Chip8Batch, check_cases, differs,
+                      random_program)
+
+
+class FuzzTest(unittest.TestCase):
+
+    def test_random_program(self):
+        """
+        generated opcodes decode and jumps stay inside the program
+        """
+        table = Chip8()._decode_table
+        opcodes = random_program(random.Random(0), 500)
+        self.assertEqual(500, len(opcodes))
+
+        for opcode in opcodes:
+            self.assertIsNotNone(table[opcode])
+
+            if opcode >> 12 in (0x1, 0x2, 0xB):
+                self.assertLess(opcode & 0xFFF, 0x200 + 2 * 500)
+
+    def test_differs(self):
+        """
+        a fault only matches a fault in the same window
+        """
+        self.assertFalse(differs([b'a', FAULT], [b'a', FAULT]))
+        self.assertTrue(differs([b'a', FAULT], [b'a', b'b', FAULT]))
+        self.assertTrue(differs([b'a', FAULT], [FAULT]))
+
+    def test_engines_agree(self):
+        """
+        the engines match emulate_cycle on a few hundred programs
+        """
+        engines = ('run', 'blocks') + ('batch',) * (Chip8Batch is not None)
+        observed = check_cases(range(0, 200), 32, 128, 16, engines)
+        self.assertEqual([], observed)
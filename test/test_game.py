@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from src.chip8 import Chip8
+from src.game import Host, serve
+from src.movie import Recorder
+from src.shm import FramePublisher, FrameReader
+
+
+class GameTest(unittest.TestCase):
+
+    def test_serve(self):
+        """
+        a headless machine publishes its frames to shared memory
+        """
+        c8 = Chip8()
+        c8.load_rom('2-ibm-logo.ch8')
+
+        with FramePublisher(c8) as publisher:
+            with FrameReader(publisher.name) as reader:
+                served = serve([c8], [publisher])
+                self.assertRaises(TimeoutError, asyncio.run,
+                                  asyncio.wait_for(served, 0.5))
+                frame, gfx = reader.read()
+                self.assertLess(0, frame)
+                self.assertEqual(c8.gfx.rows, gfx.rows)
+                self.assertLess(0, sum(gfx.rows))
+
+    def test_host_timers(self):
+        """
+        the timers of a hosted machine follow its instruction count
+        """
+        # 6014 F015 F007 3000 1204 7001 1200
+        rom = bytes([0x60, 0x14, 0xF0, 0x15, 0xF0, 0x07, 0x30, 0x00,
+                     0x12, 0x04, 0x71, 0x01, 0x12, 0x00])
+        c8 = Chip8(seed=0)
+        c8.load_rom(rom)
+        host = Host(c8, cpu_hz=6000)
+
+        async def hosted():
+            await asyncio.wait_for(asyncio.gather(*host.tasks()), 0.2)
+
+        self.assertRaises(TimeoutError, asyncio.run, hosted())
+
+        expected = Chip8(seed=0)
+        expected.load_rom(rom)
+        expected.cpu_hz = 6000
+        expected.run(c8.cycles)
+        self.assertLess(0, c8.cycles)
+        self.assertEqual(expected.snapshot(), c8.snapshot())
+
+    def test_host_record(self):
+        """
+        a movie recorded on a hosted machine replays to the same state
+        """
+        recorder = Recorder('6-keypad.ch8', seed=1)
+        host = Host(recorder.chip8)
+
+        async def type_keys():
+            for key in (0x5, 0xA):
+                await asyncio.sleep(0.05)
+                recorder.press_key(key)
+                await asyncio.sleep(0.05)
+                recorder.release_key(key)
+
+            await asyncio.sleep(1)
+
+        async def hosted():
+            await asyncio.wait_for(
+                asyncio.gather(*host.tasks(), type_keys()), 0.3)
+
+        self.assertRaises(TimeoutError, asyncio.run, hosted())
+        movie = recorder.stop()
+        self.assertEqual(4, len(movie.events))
+        self.assertTrue(movie.verify('6-keypad.ch8'))
@@ -0,0 +1,52 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.movie import Movie, MovieError, Recorder
+
+
+class MovieTest(unittest.TestCase):
+
+    def test_seeded_random(self):
+        """
+        machines with the same seed draw the same CXNN values
+        """
+        values = []
+
+        for _ in range(0, 2):
+            c8 = Chip8(seed=42)
+            c8.memory[0x200:0x204] = [0xC0, 0xFF, 0x12, 0x00]
+            c8.run(1)
+            values.append(c8.regs[0])
+
+        self.assertEqual(values[0], values[1])
+
+    def test_record_replay(self):
+        """
+        a replayed movie ends in the recorded state
+        """
+        recorder = Recorder('6-keypad.ch8', seed=7)
+        recorder.chip8.run(200)
+        recorder.press_key(0x5)
+        recorder.chip8.run(50)
+        recorder.release_key(0x5)
+        recorder.chip8.run(100)
+        movie = recorder.stop()
+        observed = movie.events
+        self.assertEqual([(200, 0x5, True), (250, 0x5, False)], observed)
+
+        movie = Movie.from_bytes(movie.to_bytes())
+        self.assertEqual(350, movie.length)
+        self.assertTrue(movie.verify('6-keypad.ch8'))
+        observed = movie.replay('6-keypad.ch8').snapshot()
+        self.assertEqual(recorder.chip8.snapshot(), observed)
+
+        movie.events = movie.events[:1]
+        self.assertFalse(movie.verify('6-keypad.ch8'))
+
+    def test_bad_movie(self):
+        """
+        reject data that is not a movie
+        """
+        data = Movie().to_bytes()
+        self.assertRaises(MovieError, Movie.from_bytes, data[:-1])
+        self.assertRaises(MovieError, Movie.from_bytes, b'XXXX' + data[4:])
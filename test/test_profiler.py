@@ -0,0 +1,64 @@
+import json
+import unittest
+
+from src.chip8 import Chip8
+from src.profiler import Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_matches_run(self):
+        """
+        profiling leaves the machine as Chip8.run would
+        """
+        expected = Chip8(seed=0)
+        expected.load_rom('5-quirks.ch8')
+        expected.memory[0x1FF] = 1
+        expected.run(3000)
+
+        c8 = Chip8(seed=0)
+        c8.load_rom('5-quirks.ch8')
+        c8.memory[0x1FF] = 1
+        profiler = Profiler(c8)
+        observed = profiler.run(3000)
+        self.assertEqual(3000, observed)
+        self.assertEqual(expected.snapshot(), c8.snapshot())
+
+        report = json.loads(profiler.to_json())
+        observed = sum(f['count'] for f in report['families'].values())
+        self.assertEqual(3000, observed)
+        observed = report['families']['draw']['pattern']
+        self.assertEqual('DXYN', observed)
+        observed = report['draws']
+        self.assertEqual(profiler.counts['draw'], observed)
+
+    def test_folded(self):
+        """
+        fold instruction counts on the call stack
+        """
+        c8 = Chip8()
+        # 2206 6001 1204 6102 00EE
+        c8.memory[0x200:0x20A] = [0x22, 0x06, 0x60, 0x01, 0x12, 0x04,
+                                  0x61, 0x02, 0x00, 0xEE]
+        c8.delay_timer = 1
+        c8.cpu_hz = c8.timer_hz
+        profiler = Profiler(c8)
+        profiler.run(5)
+        observed = profiler.folded()
+        self.assertEqual('main 3\nmain;sub_206 2\n', observed)
+        observed = profiler.timer_underflows
+        self.assertEqual(1, observed)
+
+    def test_rate_change(self):
+        """
+        timers keep ticking after cpu_hz drops below the timer phase
+        """
+        c8 = Chip8()
+        c8.memory[0x200:0x202] = [0x12, 0x00]
+        c8.cpu_hz = 600
+        c8.timer_phase = 8
+        c8.cpu_hz = 300
+        c8.delay_timer = 50
+        Profiler(c8).run(1000)
+        observed = c8.delay_timer
+        self.assertEqual(0, observed)
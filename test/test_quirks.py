@@ -0,0 +1,113 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.quirks import PROFILES, Chip48, CosmacVip, SuperChip, machine
+
+
+def program(cls, *opcodes):
+    c8 = cls()
+
+    for i, opcode in enumerate(opcodes):
+        c8.memory[c8.pc + 2 * i] = opcode >> 8
+        c8.memory[c8.pc + 2 * i + 1] = opcode & 0xFF
+
+    return c8
+
+
+class QuirksTest(unittest.TestCase):
+
+    def test_machine(self):
+        """
+        build a machine by profile name
+        """
+        for name, cls in PROFILES.items():
+            self.assertIs(cls, type(machine(name)))
+
+        self.assertRaises(ValueError, machine, 'eti660')
+
+    def test_decode_table(self):
+        """
+        every profile has its own table, the default one is untouched
+        """
+        c8 = CosmacVip()
+        observed = c8._decode_table[0x8016][0]
+        self.assertIs(CosmacVip.shr, observed)
+        observed = Chip8()._decode_table[0x8016][0]
+        self.assertIs(Chip8.shr, observed)
+        self.assertFalse(hasattr(c8, '__dict__'))
+
+    def test_shift_vy(self):
+        """
+        the VIP shifts vY into vX
+        """
+        c8 = program(CosmacVip, 0x8016, 0x821E)
+        c8.regs[1] = 0xFF
+        c8.regs[2] = 0x00
+        c8.run(1)
+        observed = (c8.regs[0], c8.regs[0xF])
+        self.assertEqual((0x7F, 1), observed)
+        c8.run(1)
+        observed = (c8.regs[2], c8.regs[0xF])
+        self.assertEqual((0xFE, 1), observed)
+        c8 = program(SuperChip, 0x8016)
+        c8.regs[0] = 0x04
+        c8.regs[1] = 0xFF
+        c8.run(1)
+        observed = (c8.regs[0], c8.regs[0xF])
+        self.assertEqual((0x02, 0), observed)
+
+    def test_index_increment(self):
+        """
+        FX55 and FX65 move I by X + 1 on the VIP, by X on CHIP-48
+        """
+        for cls, expected in ((CosmacVip, 0x303), (Chip48, 0x302),
+                              (SuperChip, 0x300)):
+            c8 = program(cls, 0xF255)
+            c8.index = 0x300
+            c8.run(1)
+            self.assertEqual(expected, c8.index)
+
+    def test_jump(self):
+        """
+        BXNN jumps to XNN + vX on CHIP-48 and SUPER-CHIP
+        """
+        c8 = program(Chip48, 0xB220)
+        c8.regs[0] = 0x01
+        c8.regs[2] = 0x10
+        c8.run(1)
+        observed = c8.pc
+        self.assertEqual(0x230, observed)
+        c8 = program(CosmacVip, 0xB220)
+        c8.regs[0] = 0x01
+        c8.run(1)
+        observed = c8.pc
+        self.assertEqual(0x221, observed)
+
+    def test_clip(self):
+        """
+        sprites past the right and bottom edges are clipped
+        """
+        c8 = program(CosmacVip, 0xD012)
+        c8.memory[0x300:0x302] = [0xFF, 0xFF]
+        c8.index = 0x300
+        c8.regs[0] = 60
+        c8.regs[1] = 31
+        c8.run(1)
+        observed = c8.gfx.rows
+        expected = [0] * 31 + [0xF]
+        self.assertEqual(expected, observed)
+        observed = c8.regs[0xF]
+        self.assertEqual(0, observed)
+
+    def test_reset_vf(self):
+        """
+        logic operations clear vF on the VIP only
+        """
+        for cls, expected in ((CosmacVip, 0), (SuperChip, 1)):
+            c8 = program(cls, 0x8011, 0x8012, 0x8013)
+
+            for _ in range(3):
+                c8.regs[0xF] = 1
+                c8.run(1)
+                self.assertEqual(expected, c8.regs[0xF])
+
@@ -0,0 +1,93 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.quirks import SuperChip, XoChip
+from src.rewind import Rewinder
+
+
+class RewinderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.c8 = Chip8()
+        self.c8.load_rom('5-quirks.ch8')
+        self.c8.memory[0x1FF] = 1
+        self.rewinder = Rewinder(self.c8, interval=100, segments=10)
+        self.history = []
+
+        for _ in range(0, 1500):
+            self.history.append(self.c8.snapshot())
+            self.rewinder.step()
+
+        self.history.append(self.c8.snapshot())
+
+    def test_step_back(self):
+        """
+        undo single instructions
+        """
+        observed = self.rewinder.step_back(3)
+        self.assertEqual(3, observed)
+        self.assertEqual(self.history[1497], self.c8.snapshot())
+
+    def test_seek(self):
+        """
+        return to any cycle in the history and continue from there
+        """
+        for cycle in (1490, 1234, 1001, 600):
+            self.rewinder.seek(cycle)
+            self.assertEqual(self.history[cycle], self.c8.snapshot())
+
+        self.rewinder.run(20)
+        self.assertEqual(self.history[620], self.c8.snapshot())
+
+    def test_bounded(self):
+        """
+        only the last interval * segments cycles are kept
+        """
+        observed = len(self.rewinder.segments)
+        self.assertEqual(10, observed)
+        observed = self.rewinder.oldest
+        self.assertEqual(500, observed)
+        self.assertRaises(ValueError, self.rewinder.seek, 499)
+
+
+class ExtendedRewinderTest(unittest.TestCase):
+
+    def rewind(self, c8, program, cycles):
+        """
+        run program, then step back over every instruction, return the
+        snapshots taken on the way forward and on the way back
+        """
+        c8.memory[0x200:0x200 + len(program)] = program
+        rewinder = Rewinder(c8, interval=4)
+        history = []
+
+        for _ in range(cycles):
+            history.append(c8.snapshot())
+            rewinder.step()
+
+        rewound = []
+
+        while rewinder.step_back():
+            rewound.append(c8.snapshot())
+
+        return history[::-1], rewound
+
+    def test_super_chip(self):
+        """
+        undo resolution switches, flag registers and CXNN draws
+        """
+        # 00FF C0FF F075 A200 D015 00FE 1200
+        program = [0x00, 0xFF, 0xC0, 0xFF, 0xF0, 0x75, 0xA2, 0x00,
+                   0xD0, 0x15, 0x00, 0xFE, 0x12, 0x00]
+        expected, observed = self.rewind(SuperChip(seed=0), program, 20)
+        self.assertEqual(expected, observed)
+
+    def test_xo_chip(self):
+        """
+        undo drawing on the second plane and the plane mask
+        """
+        # 00FF F201 C0FF A200 D015 00FE 1200
+        program = [0x00, 0xFF, 0xF2, 0x01, 0xC0, 0xFF, 0xA2, 0x00,
+                   0xD0, 0x15, 0x00, 0xFE, 0x12, 0x00]
+        expected, observed = self.rewind(XoChip(seed=0), program, 20)
+        self.assertEqual(expected, observed)
@@ -0,0 +1,72 @@
+import unittest
+
+from src.chip8 import Chip8
+from src.shm import (FRAME_SEQUENCE, FRAME_SIZE, SEQUENCE_OFFSET,
+                     SIZE_OFFSET, FrameError, FramePublisher, FrameReader)
+
+
+class SharedFrameTest(unittest.TestCase):
+
+    def test_publish_read(self):
+        """
+        a reader sees the frames the publisher wrote
+        """
+        c8 = Chip8()
+        c8.load_rom('2-ibm-logo.ch8')
+
+        with FramePublisher(c8) as publisher:
+            with FrameReader(publisher.name) as reader:
+                observed = reader.read()
+                self.assertEqual((0, None), observed)
+
+                c8.run(500)
+                self.assertTrue(publisher.publish())
+                self.assertFalse(publisher.publish())
+                frame, gfx = reader.read()
+                self.assertEqual(1, frame)
+                self.assertEqual(c8.gfx.rows, gfx.rows)
+
+    def test_not_a_framebuffer(self):
+        """
+        refuse to attach to other shared memory
+        """
+        c8 = Chip8()
+
+        with FramePublisher(c8) as publisher:
+            publisher.shm.buf[:4] = b'XXXX'
+            self.assertRaises(FrameError, FrameReader, publisher.name)
+
+    def test_stuck_publisher(self):
+        """
+        a frame left half written gives the last whole one, or an error
+        """
+        c8 = Chip8()
+        c8.load_rom('2-ibm-logo.ch8')
+
+        with FramePublisher(c8) as publisher:
+            buf = publisher.shm.buf
+
+            with FrameReader(publisher.name) as reader:
+                FRAME_SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, 1)
+                self.assertRaises(FrameError, reader.read, 0.01)
+
+                FRAME_SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, 0)
+                c8.run(500)
+                publisher.publish()
+                expected = reader.read()
+                FRAME_SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, 3)
+                observed = reader.read(0.01)
+                self.assertEqual(expected, observed)
+
+    def test_oversized_frame(self):
+        """
+        refuse a header that claims more pixels than the block holds
+        """
+        c8 = Chip8()
+
+        with FramePublisher(c8) as publisher:
+            publisher.publish()
+            FRAME_SIZE.pack_into(publisher.shm.buf, SIZE_OFFSET, 4096, 4096)
+
+            with FrameReader(publisher.name) as reader:
+                self.assertRaises(FrameError, reader.read)
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+
+from src.chip8 import Chip8
+from src.trace import TraceError, TraceRecorder, read_trace
+
+
+class TraceTest(unittest.TestCase):
+
+    def test_record_read(self):
+        """
+        a recorded trace reads back one record per instruction
+        """
+        expected = Chip8(seed=0)
+        expected.load_rom('5-quirks.ch8')
+        expected.memory[0x1FF] = 1
+        expected.run(3000)
+
+        c8 = Chip8(seed=0)
+        c8.load_rom('5-quirks.ch8')
+        c8.memory[0x1FF] = 1
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'quirks.c8t')
+
+            with TraceRecorder(c8, path, chunk_records=1000) as recorder:
+                observed = recorder.run(2000)
+                self.assertEqual(2000, observed)
+                recorder.run(1000)
+
+            self.assertEqual(expected.snapshot(), c8.snapshot())
+            records = list(read_trace(path))
+
+        observed = [record[0] for record in records]
+        self.assertEqual(list(range(0, 3000)), observed)
+        observed = records[0][1:3]
+        self.assertEqual((0x200, 0x130C), observed)
+        observed = records[-1][5]
+        self.assertEqual(bytes(c8.regs), observed)
+
+    def test_changed(self):
+        """
+        the changed mask has a bit for every register the instruction wrote
+        """
+        c8 = Chip8()
+        # 6005 6105 8014
+        c8.memory[0x200:0x206] = [0x60, 0x05, 0x61, 0x05, 0x80, 0x14]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'add.c8t')
+
+            with TraceRecorder(c8, path) as recorder:
+                recorder.run(3)
+
+            observed = [record[4] for record in read_trace(path)]
+
+        self.assertEqual([0x0001, 0x0002, 0x0001], observed)
+
+    def test_wide_index(self):
+        """
+        record I after FX1E carried it past 16 bits
+        """
+        c8 = Chip8()
+        # 6020 F01E
+        c8.memory[0x200:0x204] = [0x60, 0x20, 0xF0, 0x1E]
+        c8.index = 0xFFF0
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.c8t')
+
+            with TraceRecorder(c8, path) as recorder:
+                recorder.run(2)
+
+            observed = [record[3] for record in read_trace(path)]
+
+        self.assertEqual([0xFFF0, 0x10010], observed)
+
+    def test_bad_trace(self):
+        """
+        reject files that are not traces
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bad.c8t')
+
+            with open(path, 'wb') as f:
+                f.write(b'XXXX\x20\x00')
+
+            self.assertRaises(TraceError, list, read_trace(path))